@@ -0,0 +1,199 @@
+import time
+import logging
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pytesseract
+from PIL import Image, ImageOps
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Primeira passada: a mesma configuração rápida do OCR simples
+FAST_CONFIG = r'--oem 3 --psm 6'
+
+# Linhas abaixo desta confiança (0-100) são lidas de novo
+MIN_CONFIDENCE = 70.0
+
+# Tempo máximo (em segundos) gasto relendo linhas de baixa confiança
+RETRY_TIME_BUDGET = 5.0
+
+# Tentativas para as linhas ruins, da mais barata para a mais cara: (config, escala)
+RETRY_STRATEGIES: Tuple[Tuple[str, float], ...] = (
+    (r'--oem 3 --psm 7', 1.0),
+    (r'--oem 3 --psm 7', 2.0),
+    (r'--oem 3 --psm 13', 3.0),
+)
+
+# Margem (em pixels) em volta da linha recortada
+CROP_PADDING = 6
+
+
+class OcrWord(NamedTuple):
+    """
+    Palavra reconhecida pelo tesseract, com a confiança (0-100) e a caixa na imagem original
+    """
+    text: str
+    conf: float
+    left: int
+    top: int
+    width: int
+    height: int
+    block: int
+    par: int
+    line: int
+
+
+class OcrLine(NamedTuple):
+    """
+    Linha do texto extraído (uma célula do horário) com a confiança média das palavras
+    """
+    text: str
+    conf: float
+    words: Tuple[OcrWord, ...]
+    retried: bool = False
+
+    @property
+    def box(self) -> Tuple[int, int, int, int]:
+        left = min(w.left for w in self.words)
+        top = min(w.top for w in self.words)
+        right = max(w.left + w.width for w in self.words)
+        bottom = max(w.top + w.height for w in self.words)
+        return left, top, right, bottom
+
+
+class OcrResult(NamedTuple):
+    """
+    Resultado do OCR adaptativo: texto final, linhas com confiança e quantas linhas foram relidas
+    """
+    text: str
+    lines: List[OcrLine]
+    retried: int
+    improved: int
+
+    @property
+    def words(self) -> List[OcrWord]:
+        return [word for line in self.lines for word in line.words]
+
+    @property
+    def low_confidence(self) -> List[OcrLine]:
+        return [line for line in self.lines if line.conf < MIN_CONFIDENCE]
+
+
+def words_from_data(data: Dict[str, list], offset: Tuple[int, int] = (0, 0), scale: float = 1.0) -> List[OcrWord]:
+    """
+    Converte a saída de image_to_data (Output.DICT) em palavras, descartando caixas vazias
+
+    offset e scale convertem as coordenadas de um recorte ampliado para a imagem original.
+    """
+    words = []
+    for i, text in enumerate(data["text"]):
+        text = (text or "").strip()
+        conf = float(data["conf"][i])
+        if not text or conf < 0:
+            continue
+        words.append(OcrWord(
+            text=text,
+            conf=conf,
+            left=offset[0] + int(data["left"][i] / scale),
+            top=offset[1] + int(data["top"][i] / scale),
+            width=int(data["width"][i] / scale),
+            height=int(data["height"][i] / scale),
+            block=int(data["block_num"][i]),
+            par=int(data["par_num"][i]),
+            line=int(data["line_num"][i]),
+        ))
+    return words
+
+
+def group_lines(words: Sequence[OcrWord]) -> List[OcrLine]:
+    """
+    Agrupa as palavras nas linhas do tesseract (bloco, parágrafo, linha), na ordem de leitura
+    """
+    lines: Dict[Tuple[int, int, int], List[OcrWord]] = {}
+    for word in words:
+        lines.setdefault((word.block, word.par, word.line), []).append(word)
+    return [
+        OcrLine(" ".join(w.text for w in line_words), sum(w.conf for w in line_words) / len(line_words), tuple(line_words))
+        for line_words in lines.values()
+    ]
+
+
+class AdaptiveOcr:
+    """
+    OCR em várias passadas guiado pela confiança do tesseract
+
+    A primeira passada lê a imagem inteira com a configuração rápida; só as linhas com
+    confiança abaixo de min_confidence são recortadas e relidas com outras configurações
+    (outro PSM, ampliação), até acabar o tempo de time_budget segundos.
+    """
+
+    def __init__(self, lang: str = 'por', fast_config: str = FAST_CONFIG, min_confidence: float = MIN_CONFIDENCE,
+                 time_budget: float = RETRY_TIME_BUDGET,
+                 strategies: Sequence[Tuple[str, float]] = RETRY_STRATEGIES):
+        self.lang = lang
+        self.fast_config = fast_config
+        self.min_confidence = min_confidence
+        self.time_budget = time_budget
+        self.strategies = tuple(strategies)
+
+    def _image_to_data(self, image: Image.Image, config: str) -> Dict[str, list]:
+        return pytesseract.image_to_data(image, lang=self.lang, config=config, output_type=pytesseract.Output.DICT)
+
+    def read(self, image: Image.Image) -> OcrResult:
+        """
+        Lê a imagem e devolve o texto com a confiança de cada linha
+        """
+        with metrics.timer("ocr_pass", kind="fast"):
+            lines = group_lines(words_from_data(self._image_to_data(image, self.fast_config)))
+
+        deadline = time.monotonic() + self.time_budget
+        # As piores linhas primeiro: se o tempo acabar, as mais prováveis de estarem erradas já foram relidas
+        pending = sorted((i for i, line in enumerate(lines) if line.conf < self.min_confidence),
+                         key=lambda i: lines[i].conf)
+        retried = improved = 0
+        for i in pending:
+            if time.monotonic() >= deadline:
+                logger.info(f"Tempo de releitura esgotado: {len(pending) - retried} linhas mantidas da primeira passada")
+                break
+            retried += 1
+            better = self._retry_line(image, lines[i], deadline)
+            if better is not None:
+                lines[i] = better
+                improved += 1
+
+        metrics.inc("ocr_lines", len(lines))
+        metrics.inc("ocr_retried_lines", retried)
+        metrics.inc("ocr_improved_lines", improved)
+        text = "\n".join(line.text for line in lines)
+        return OcrResult(text, lines, retried, improved)
+
+    def _retry_line(self, image: Image.Image, line: OcrLine, deadline: float) -> Optional[OcrLine]:
+        """
+        Relê uma linha recortada com as estratégias alternativas; devolve a melhor leitura, se superar a original
+        """
+        left, top, right, bottom = line.box
+        box = (max(left - CROP_PADDING, 0), max(top - CROP_PADDING, 0),
+               min(right + CROP_PADDING, image.width), min(bottom + CROP_PADDING, image.height))
+        crop = ImageOps.autocontrast(ImageOps.grayscale(image.crop(box)))
+
+        best = None
+        for config, scale in self.strategies:
+            if time.monotonic() >= deadline:
+                break
+            candidate = crop
+            if scale != 1.0:
+                candidate = crop.resize((int(crop.width * scale), int(crop.height * scale)), Image.LANCZOS)
+            with metrics.timer("ocr_pass", kind="retry"):
+                words = words_from_data(self._image_to_data(candidate, config), offset=box[:2], scale=scale)
+            if not words:
+                continue
+            # Uma célula é uma linha só, mesmo que o PSM alternativo a quebre
+            words = [word._replace(block=line.words[0].block, par=line.words[0].par, line=line.words[0].line)
+                     for word in words]
+            conf = sum(w.conf for w in words) / len(words)
+            if conf > (best.conf if best else line.conf):
+                best = OcrLine(" ".join(w.text for w in words), conf, tuple(words), retried=True)
+                if conf >= self.min_confidence:
+                    break
+        return best
@@ -1,9 +1,15 @@
 import streamlit as st
 import os
 from pathlib import Path
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from main import CalendarGenerator
+from holiday_calendar import HolidayCalendar
+from adaptive_ocr import MIN_CONFIDENCE
+from layout_parser import schedule_to_text
+from schedule import DIAS
+from documents import is_document, page_count
 from google_calendar_manager import GoogleCalendarManager
+from metrics import metrics, log_event
 import time
 import logging
 
@@ -37,14 +43,97 @@ use_google_calendar = st.sidebar.checkbox(
     help="Cria eventos diretamente no seu Google Calendar"
 )
 
+# Une aulas duplas (mesma matéria em aulas seguidas) em um único evento
+merge_slots = st.sidebar.checkbox(
+    "Unir aulas seguidas da mesma matéria",
+    value=True,
+    help="Uma aula dupla vira um único evento em vez de dois"
+)
+
+# Saídas extras geradas a partir da mesma compilação do horário
+extra_sinks = st.sidebar.multiselect(
+    "Saídas extras",
+    options=["json", "csv", "feed"],
+    help="Além do .ics (ou do Google Calendar), grava o horário em JSON, CSV ou no servidor de feeds"
+)
+sinks = (["google"] if use_google_calendar else ["ics"]) + extra_sinks
+
+# OCR adaptativo: relê só as linhas com baixa confiança
+adaptive_ocr = st.sidebar.checkbox(
+    "OCR adaptativo",
+    value=True,
+    help="Relê com outras configurações as linhas que o OCR leu com baixa confiança e mostra a confiança de cada linha"
+)
+
+# Turma usada para marcar (e substituir) os eventos criados
+class_id = st.sidebar.text_input(
+    "Turma",
+    value="",
+    help="Eventos já criados para a mesma turma são substituídos"
+)
+
+# Feriados e recessos (sem arquivo, usa o feriados.txt do projeto, se existir)
+holidays_file = st.sidebar.file_uploader(
+    "Feriados e recessos",
+    type=['txt', 'csv'],
+    help="Uma data (AAAA-MM-DD) ou período (início..fim) por linha; períodos longos viram recesso"
+)
+holidays = HolidayCalendar.from_lines(holidays_file.getvalue().decode('utf-8').splitlines()) if holidays_file else None
+
+def show_report(report):
+    """
+    Mostra o resultado de cada saída quando há mais de uma
+    """
+    if report is not None and len(report.stats) > 1:
+        with st.expander("📤 Saídas", expanded=not report.ok):
+            st.dataframe(
+                [
+                    {"Saída": s.name, "Resultado": report.result(s.name) or s.last_error, "Tempo (s)": round(s.seconds, 3), "Erros": s.errors}
+                    for s in report.stats.values()
+                ],
+                use_container_width=True
+            )
+
 # Upload de arquivo
 uploaded_file = st.file_uploader(
     "Escolha uma imagem do horário escolar",
-    type=['png', 'jpg', 'jpeg'],
-    help="Formatos suportados: PNG, JPG, JPEG"
+    type=['png', 'jpg', 'jpeg', 'pdf', 'tif', 'tiff'],
+    help="Formatos suportados: PNG, JPG, JPEG, e PDF/TIFF com uma turma por página"
 )
 
-if uploaded_file is not None:
+if uploaded_file is not None and is_document(uploaded_file.name):
+    # Documento com várias páginas: cada página é uma turma, processadas em paralelo
+    st.info(f"📄 Documento `{uploaded_file.name}`: cada página será tratada como uma turma")
+    if st.button("🚀 Processar Documento", type="primary"):
+        temp_path = f"temp_{uploaded_file.name}"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(uploaded_file.getbuffer())
+            
+            generator = CalendarGenerator(use_google_calendar=use_google_calendar, turno="manha", merge_slots=merge_slots, holidays=holidays, sinks=sinks)
+            total = page_count(temp_path)
+            progress = st.progress(0.0, text=f"0 de {total} páginas")
+            for done, (page_class_id, result) in enumerate(generator.process_document(temp_path, end_date.strftime("%Y-%m-%d")), start=1):
+                progress.progress(done / total, text=f"{done} de {total} páginas")
+                if use_google_calendar:
+                    st.write(f"✅ **{page_class_id}**: {result}")
+                else:
+                    with open(result, "rb") as f:
+                        st.download_button(
+                            label=f"📥 {page_class_id}",
+                            data=f.read(),
+                            file_name=Path(result).name,
+                            mime="text/calendar",
+                            key=f"download_{done}"
+                        )
+            show_report(generator.last_report)
+        except Exception as e:
+            st.error(f"❌ Erro ao processar documento: {str(e)}")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+elif uploaded_file is not None:
     # Mostra a imagem
     st.image(uploaded_file, caption="Imagem carregada", use_column_width=True)
     
@@ -62,13 +151,30 @@ if uploaded_file is not None:
                 
                 # Processa a imagem
                 with st.spinner("🔄 Processando imagem..."):
-                    generator = CalendarGenerator(use_google_calendar=use_google_calendar, turno="manha")
-                    raw_text = generator.parser.extract_text_from_image(temp_path)
+                    generator = CalendarGenerator(use_google_calendar=use_google_calendar, turno="manha", merge_slots=merge_slots, holidays=holidays, sinks=sinks)
+                    if adaptive_ocr:
+                        ocr_result = generator.parser.extract_text_with_confidence(temp_path)
+                        raw_text = ocr_result.text
+                        ocr_lines = [(line.text, line.conf, line.retried) for line in ocr_result.lines]
+                        
+                        # Com um cabeçalho de dias, monta a grade pela posição das palavras (dia por coluna ou por linha)
+                        layout = generator.parser.parse_schedule_from_words(ocr_result.words, class_id=class_id or None)
+                        if layout is not None and layout.cells:
+                            raw_text = schedule_to_text(layout.schedule)
+                            ocr_lines = [
+                                (f"{DIAS[cell.weekday]} {cell.slot + 1}ª aula: {cell.text}", cell.conf, False)
+                                for cell in layout.cells
+                            ]
+                            st.info(f"🧭 Grade reconhecida com um dia por {'coluna' if layout.orientation == 'colunas' else 'linha'}")
+                    else:
+                        raw_text = generator.parser.extract_text_from_image(temp_path)
+                        ocr_lines = None
                     
                     # Salva no estado da sessão
                     st.session_state.temp_path = temp_path
                     st.session_state.generator = generator
                     st.session_state.raw_text = raw_text
+                    st.session_state.ocr_lines = ocr_lines
                     st.session_state.processing_stage = 'review'
                     
             except Exception as e:
@@ -77,6 +183,21 @@ if uploaded_file is not None:
                     os.remove(temp_path)
     
     elif st.session_state.processing_stage == 'review':
+        # Confiança do OCR por linha, para saber onde revisar
+        ocr_lines = st.session_state.get('ocr_lines')
+        if ocr_lines:
+            low_confidence = [text for text, conf, _ in ocr_lines if conf < MIN_CONFIDENCE]
+            if low_confidence:
+                st.warning(f"⚠️ {len(low_confidence)} linhas com baixa confiança: confira " + ", ".join(f"`{t}`" for t in low_confidence))
+            with st.expander("🔍 Confiança do OCR por linha", expanded=bool(low_confidence)):
+                st.dataframe(
+                    [
+                        {"Linha": text, "Confiança (%)": round(conf), "Relida": "✔" if retried else "", "Revisar": "⚠️" if conf < MIN_CONFIDENCE else ""}
+                        for text, conf, retried in ocr_lines
+                    ],
+                    use_container_width=True
+                )
+        
         # Campo editável para o usuário revisar/corrigir
         edited_text = st.text_area("Texto extraído (edite se necessário):", 
                                  value=st.session_state.raw_text, 
@@ -90,7 +211,8 @@ if uploaded_file is not None:
                         # Usa o texto editado para gerar o calendário
                         result = st.session_state.generator.process_text(
                             edited_text, 
-                            end_date.strftime("%Y-%m-%d")
+                            end_date.strftime("%Y-%m-%d"),
+                            class_id=class_id or None
                         )
                         
                         # Remove arquivo temporário
@@ -117,6 +239,8 @@ if uploaded_file is not None:
     elif st.session_state.processing_stage == 'result':
         st.success("✅ Calendário gerado com sucesso!")
         
+        show_report(st.session_state.generator.last_report)
+        
         if use_google_calendar:
             st.info(f"📅 **Google Calendar:** {st.session_state.result}")
             st.markdown("""
@@ -146,7 +270,7 @@ if uploaded_file is not None:
         
         if st.button("🔄 Processar Outra Imagem"):
             # Limpa o estado da sessão
-            for key in ['processing_stage', 'temp_path', 'generator', 'raw_text', 'result']:
+            for key in ['processing_stage', 'temp_path', 'generator', 'raw_text', 'ocr_lines', 'result']:
                 if key in st.session_state:
                     del st.session_state[key]
             st.rerun()
@@ -170,9 +294,9 @@ if st.sidebar.button("Apagar TODOS os eventos futuros"):
     for dia, eventos in sorted(eventos_por_dia.items()):
         for event in eventos:
             try:
-                google_manager.service.events().delete(calendarId='primary', eventId=event['id']).execute()
+                google_manager.delete_event(event['id'])
                 deleted_count += 1
-                logger.info(f"Evento deletado: {event.get('summary', '')}")
+                log_event(logger, f"Evento deletado: {event.get('summary', '')}")
                 time.sleep(0.2)
             except Exception as e:
                 logger.error(f"Erro ao deletar evento: {e}")
@@ -185,22 +309,19 @@ selected_day = st.sidebar.date_input("Escolha o dia para apagar eventos", value=
 if st.sidebar.button("Apagar eventos desse dia"):
     google_manager = GoogleCalendarManager()
     google_manager.authenticate()
-    start = datetime.combine(selected_day, datetime.min.time()).isoformat() + 'Z'
-    end = (datetime.combine(selected_day, datetime.max.time()) + timedelta(seconds=-1)).isoformat() + 'Z'
-    events = google_manager.service.events().list(
-        calendarId='primary',
-        timeMin=start,
-        timeMax=end,
-        singleEvents=True,
-        maxResults=1000
-    ).execute().get('items', [])
+    start = datetime.combine(selected_day, datetime.min.time(), tzinfo=timezone.utc)
+    # Usa o espelho local (sync tokens) em vez de listar o dia na API
+    events = google_manager.get_events_between(start, start + timedelta(days=1))
     deleted_count = 0
     for event in events:
         try:
-            google_manager.service.events().delete(calendarId='primary', eventId=event['id']).execute()
+            google_manager.delete_event(event['id'])
             deleted_count += 1
-            logger.info(f"Evento deletado: {event.get('summary', '')}")
+            log_event(logger, f"Evento deletado: {event.get('summary', '')}")
             time.sleep(0.2)
         except Exception as e:
             logger.error(f"Erro ao deletar evento: {e}")
     st.sidebar.success(f"{deleted_count} eventos apagados para {selected_day.strftime('%d/%m/%Y')}")
+
+with st.sidebar.expander("📊 Métricas"):
+    st.code(metrics.to_prometheus(), language="text")
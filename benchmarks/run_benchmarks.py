@@ -0,0 +1,357 @@
+"""
+Benchmarks do gerador de calendário
+
+Cobre OCR, parsing, exportação .ics e a orquestração do Google Calendar
+(contra a API falsa de fake_calendar_server.py, que conta as chamadas).
+
+Uso:
+    python benchmarks/run_benchmarks.py [--full] [--transport http] [--output resultados.json] [--compare anterior.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from parser import ScheduleParser
+from main import CalendarGenerator
+from metrics import metrics
+from schedule import Schedule
+from fake_calendar_server import FakeCalendarServer, FakeCalendarService
+
+logger = logging.getLogger(__name__)
+
+DIAS = ["segunda", "terça", "quarta", "quinta", "sexta"]
+MATERIAS = [
+    "Matemática", "Português", "História", "Geografia", "Química", "Física",
+    "Biologia", "Inglês", "Educação Física", "Arte", "Filosofia", "Sociologia"
+]
+
+# Tamanhos usados por padrão e com --full
+QUICK_SIZES = {"lines": [100, 10_000], "classes": [1, 10, 100]}
+FULL_SIZES = {"lines": [100, 10_000, 100_000], "classes": [1, 100, 1_000, 10_000]}
+
+
+def synthetic_schedule(rng: random.Random) -> Dict[str, List[str]]:
+    """
+    Gera um horário semanal aleatório (5 dias x 5 aulas)
+    """
+    return {dia: [rng.choice(MATERIAS) for _ in range(5)] for dia in DIAS}
+
+
+def synthetic_text(rng: random.Random, lines: int) -> str:
+    """
+    Gera um texto no formato que o OCR devolve (cabeçalho + uma matéria por linha)
+    """
+    body = [rng.choice(MATERIAS) + " " + rng.choice(["prof. Ana", "sala 3", "", "lab"]) for _ in range(lines)]
+    return "HORÁRIO ESCOLAR\n" + "\n".join(body)
+
+
+def render_timetable(path: Path, schedule: Dict[str, List[str]]):
+    """
+    Desenha um horário sintético em uma imagem para o benchmark de OCR
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 28)
+    except OSError:
+        font = ImageFont.load_default()
+    lines = ["HORÁRIO ESCOLAR"] + [materia for dia in DIAS for materia in schedule[dia]]
+    image = Image.new("L", (900, 60 + 42 * len(lines)), color=255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((40, 30 + 42 * i), line, fill=0, font=font)
+    image.save(path)
+
+
+def run_benchmark(name: str, func: Callable[[], Optional[Dict]], repeat: int, **params) -> Dict:
+    """
+    Executa func repeat vezes e devolve as estatísticas de tempo (em segundos)
+    """
+    timings = []
+    extra = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extra = func()
+        timings.append(time.perf_counter() - start)
+    result = {
+        "name": name,
+        "params": params,
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+    }
+    if extra:
+        result["extra"] = extra
+    logger.info(f"{name} {params}: mediana {result['median'] * 1000:.2f} ms")
+    return result
+
+
+def skipped(name: str, reason: str, **params) -> Dict:
+    logger.info(f"{name} {params}: ignorado ({reason})")
+    return {"name": name, "params": params, "skipped": reason}
+
+
+def bench_ocr(workdir: Path, rng: random.Random, repeat: int) -> List[Dict]:
+    import pytesseract
+
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        return [skipped("ocr.extract_text_from_image", f"tesseract indisponível: {e}")]
+
+    parser = ScheduleParser()
+    image_path = workdir / "horario_sintetico.png"
+    render_timetable(image_path, synthetic_schedule(rng))
+
+    def extract():
+        parser.extract_text_from_image(str(image_path))
+
+    def extract_adaptive():
+        result = parser.extract_text_with_confidence(str(image_path))
+        return {"lines": len(result.lines), "retried": result.retried, "improved": result.improved}
+
+    return [
+        run_benchmark("ocr.extract_text_from_image", extract, repeat),
+        run_benchmark("ocr.extract_text_with_confidence", extract_adaptive, repeat),
+    ]
+
+
+def bench_parsing(rng: random.Random, sizes: Dict, repeat: int) -> List[Dict]:
+    parser = ScheduleParser()
+    results = []
+    for lines in sizes["lines"]:
+        text = synthetic_text(rng, lines)
+
+        def parse():
+            parser.parse_schedule_from_text(text)
+
+        def subjects():
+            parser.extract_subjects_for_day(text, 0, None)
+
+        results.append(run_benchmark("parser.parse_schedule_from_text", parse, repeat, lines=lines))
+        results.append(run_benchmark("parser.extract_subjects_for_day", subjects, repeat, lines=lines))
+    return results
+
+
+def bench_schedule(rng: random.Random, sizes: Dict) -> List[Dict]:
+    """
+    Memória e serialização dos horários: Dict[str, List[str]] versus Schedule
+    """
+    results = []
+    for classes in sizes["classes"]:
+        raw = [synthetic_schedule(rng) for _ in range(classes)]
+        # Copia as strings para simular matérias vindas do OCR (sem compartilhamento)
+        raw = [{dia: [materia.encode().decode() for materia in materias] for dia, materias in s.items()} for s in raw]
+
+        def measure(build):
+            tracemalloc.start()
+            held = build()
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del held
+            return current
+
+        dict_bytes = measure(lambda: [{dia: list(materias) for dia, materias in s.items()} for s in raw])
+        compact_bytes = measure(lambda: [Schedule.from_dict(s) for s in raw])
+        compact = [Schedule.from_dict(s) for s in raw]
+
+        def serialize():
+            return {"bytes": sum(len(s.to_bytes()) for s in compact)}
+
+        result = run_benchmark("schedule.to_bytes", serialize, 3, classes=classes)
+        result["extra"].update({"dict_memory_bytes": dict_bytes, "schedule_memory_bytes": compact_bytes})
+        results.append(result)
+    return results
+
+
+def bench_ics(rng: random.Random, sizes: Dict, end_date: str) -> List[Dict]:
+    generator = CalendarGenerator(use_google_calendar=False)
+    results = []
+    for classes in sizes["classes"]:
+        schedules = [synthetic_schedule(rng) for _ in range(classes)]
+
+        def render():
+            total_bytes = 0
+            for schedule in schedules:
+                total_bytes += len(generator.render_ics(generator.compile_events(schedule, end_date)).encode("utf-8"))
+            return {"bytes": total_bytes}
+
+        def export_cached():
+            # Depois da primeira exportação, create_ics_file só confere o hash e reaproveita o arquivo
+            for schedule in schedules:
+                generator.create_ics_file(schedule, end_date)
+
+        repeat = 1 if classes >= 1000 else 3
+        results.append(run_benchmark("ics.render_ics", render, repeat, classes=classes))
+        export_cached()
+        results.append(run_benchmark("ics.create_ics_file_cached", export_cached, repeat, classes=classes))
+    return results
+
+
+def bench_google(rng: random.Random, sizes: Dict, end_date: str, transport: str, latency: float) -> List[Dict]:
+    results = []
+    for classes in sizes["classes"]:
+        schedules = [synthetic_schedule(rng) for _ in range(classes)]
+        server = None
+        if transport == "http":
+            # Passa pelo googleapiclient e pelo HTTP local, como em produção
+            server = FakeCalendarServer(latency=latency).start()
+            backend = server.backend
+            generator = CalendarGenerator(use_google_calendar=True)
+            generator.google_manager.base_url = server.url
+        else:
+            service = FakeCalendarService()
+            backend = service.backend
+            generator = CalendarGenerator(use_google_calendar=True)
+            generator.google_manager.service = service
+
+        def create():
+            backend.calls.clear()
+            for i, schedule in enumerate(schedules):
+                generator.create_google_calendar_events(schedule, end_date, class_id=f"turma{i}")
+            return {"api_calls": dict(backend.calls)}
+
+        def full_sync():
+            backend.calls.clear()
+            generator.google_manager._sync_state = {}
+            generator.google_manager.sync_events()
+            return {"api_calls": dict(backend.calls)}
+
+        def incremental_sync():
+            backend.calls.clear()
+            generator.google_manager.sync_events()
+            return {"api_calls": dict(backend.calls)}
+
+        def delete_all():
+            backend.calls.clear()
+            generator.google_manager.delete_all_school_events()
+            return {"api_calls": dict(backend.calls)}
+
+        params = {"classes": classes, "transport": transport}
+        try:
+            results.append(run_benchmark("google.create_google_calendar_events", create, 1, **params))
+            # Repetir o mesmo job só confere os eventos com uma listagem por turma (checkpoint + IDs determinísticos)
+            results.append(run_benchmark("google.create_google_calendar_events.rerun", create, 1, **params))
+            results.append(run_benchmark("google.sync_events.full", full_sync, 1, **params))
+            results.append(run_benchmark("google.sync_events.incremental", incremental_sync, 1, **params))
+            results.append(run_benchmark("google.delete_all_school_events", delete_all, 1, **params))
+        finally:
+            if server:
+                server.stop()
+    return results
+
+
+def environment() -> Dict:
+    """
+    Informações do ambiente para comparar resultados entre versões
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(current: Dict, baseline_path: str, threshold: float) -> int:
+    """
+    Compara as medianas com um resultado anterior e conta as regressões acima do limite
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {
+        (r["name"], json.dumps(r["params"], sort_keys=True)): r
+        for r in baseline["results"] if "median" in r
+    }
+    regressions = 0
+    for result in current["results"]:
+        key = (result["name"], json.dumps(result["params"], sort_keys=True))
+        if "median" not in result or key not in previous:
+            continue
+        ratio = result["median"] / previous[key]["median"] if previous[key]["median"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions += 1
+            flag = "  <-- regressão"
+        print(f"{result['name']:45} {key[1]:20} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmarks do gerador de calendário")
+    arg_parser.add_argument("--full", action="store_true", help="usa entradas grandes (até 10k turmas)")
+    arg_parser.add_argument("--only", nargs="*", choices=["ocr", "parsing", "schedule", "ics", "google"], help="grupos a executar")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="repetições dos benchmarks rápidos")
+    arg_parser.add_argument("--transport", choices=["memory", "http"], default="memory",
+                            help="Google Calendar falso em memória ou via servidor HTTP local")
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="latência do servidor HTTP falso, em segundos")
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--output", help="arquivo JSON de saída (padrão: stdout)")
+    arg_parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    arg_parser.add_argument("--threshold", type=float, default=1.2, help="razão de mediana considerada regressão")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s', force=True)
+    # Silencia os logs por evento do gerador durante as medições
+    for name in ("main", "parser", "google_calendar_manager", "jobs", "fake_calendar_server", "googleapiclient"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    sizes = FULL_SIZES if args.full else QUICK_SIZES
+    groups = args.only or ["ocr", "parsing", "schedule", "ics", "google"]
+    end_date = (date.today() + timedelta(days=120)).strftime("%Y-%m-%d")
+    rng = random.Random(args.seed)
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # Executa em um diretório temporário para não sujar output/ e o estado de sincronização
+        os.chdir(workdir)
+        try:
+            if "ocr" in groups:
+                results += bench_ocr(Path(workdir), rng, args.repeat)
+            if "parsing" in groups:
+                results += bench_parsing(rng, sizes, args.repeat)
+            if "schedule" in groups:
+                results += bench_schedule(rng, sizes)
+            if "ics" in groups:
+                results += bench_ics(rng, sizes, end_date)
+            if "google" in groups:
+                results += bench_google(rng, sizes, end_date, args.transport, args.latency)
+        finally:
+            os.chdir(cwd)
+
+    # Inclui os timers/contadores internos (OCR, parse, compile, chamadas à API...)
+    report = {"environment": environment(), "results": results, "metrics": metrics.snapshot()}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.compare:
+        sys.exit(1 if compare(report, args.compare, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
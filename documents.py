@@ -0,0 +1,182 @@
+import os
+import re
+import time
+import hashlib
+import logging
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+from PIL import Image
+
+from metrics import metrics
+from schedule import Schedule
+
+logger = logging.getLogger(__name__)
+
+# Resolução usada para rasterizar páginas de PDF (200 dpi basta para o tesseract e mantém cada página em poucos MB)
+DEFAULT_DPI = 200
+
+# Extensões tratadas como documentos de várias páginas
+DOCUMENT_SUFFIXES = (".pdf", ".tif", ".tiff")
+
+# "Turma: 6º A", "TURMA 7B", "Classe - 801", "Turma B"; a palavra inteira ("turmas" não conta)
+# seguida só do código da turma, que começa com o número da série ou é uma letra
+_CLASS_PATTERN = re.compile(
+    r'\b(?:turma|classe)\b\s*[:\-]?\s*(\d{1,4}\s*[ºª°]?(?:\s*[A-Za-z]{1,2})?|[A-Za-z]\d{0,3})\s*$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+class PageSchedule(NamedTuple):
+    """
+    Horário lido de uma página do documento
+    """
+    page: int
+    schedule: Schedule
+    text: str
+    confidence: float
+    orientation: Optional[str]
+
+
+def is_document(path: str) -> bool:
+    return Path(path).suffix.lower() in DOCUMENT_SUFFIXES
+
+
+def page_count(path: str) -> int:
+    """
+    Número de páginas do PDF ou TIFF, sem rasterizar nenhuma
+    """
+    if Path(path).suffix.lower() == ".pdf":
+        try:
+            from pdf2image import pdfinfo_from_path
+        except ImportError:
+            raise ImportError("Para ler PDFs instale o pdf2image (e o poppler-utils): pip install pdf2image")
+        return int(pdfinfo_from_path(path)["Pages"])
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def render_page(path: str, page: int, dpi: int = DEFAULT_DPI) -> Image.Image:
+    """
+    Rasteriza só a página pedida (a partir de 1)
+    """
+    if Path(path).suffix.lower() == ".pdf":
+        from pdf2image import convert_from_path
+        return convert_from_path(path, dpi=dpi, first_page=page, last_page=page, grayscale=True)[0]
+    with Image.open(path) as image:
+        image.seek(page - 1)
+        return image.convert("L")
+
+
+def document_key(path: str) -> str:
+    """
+    Hash curto do conteúdo do documento (o mesmo arquivo enviado de novo tem a mesma chave)
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:10]
+
+
+def detect_class_id(text: str) -> Optional[str]:
+    """
+    Procura a turma no cabeçalho da página ("Turma: 6º A")
+    """
+    match = _CLASS_PATTERN.search(text)
+    return match.group(1).strip() if match else None
+
+
+# Parser de cada processo do pool, criado na primeira tarefa que o processo recebe
+_worker_parser = None
+
+
+def worker_parser(turno: str = "manha"):
+    """
+    ScheduleParser do processo atual (os processos do pool reaproveitam o mesmo entre tarefas)
+    """
+    global _worker_parser
+    if _worker_parser is None or _worker_parser.turno != turno:
+        from parser import ScheduleParser
+        _worker_parser = ScheduleParser(turno=turno)
+    return _worker_parser
+
+
+def _ocr_page(path: str, page: int, dpi: int, turno: str, document: str) -> tuple:
+    """
+    Rasteriza, lê e monta o horário de uma página (roda em um processo do pool)
+
+    O horário volta como Schedule.to_bytes(): a tabela de matérias é de cada processo.
+    O tempo também volta no resultado, pois as métricas do processo filho não chegam ao pai.
+    Sem turma no cabeçalho, a turma é "<documento>_pagina_<n>": o hash do documento evita que
+    páginas de documentos diferentes caiam na mesma turma (e uma substitua os eventos da outra).
+    """
+    parser = worker_parser(turno)
+
+    start = time.perf_counter()
+    image = render_page(path, page, dpi)
+    try:
+        result = parser.adaptive_ocr.read(image)
+    finally:
+        image.close()
+
+    class_id = detect_class_id(result.text) or f"{document}_pagina_{page}"
+    layout = parser.parse_schedule_from_words(result.words, class_id=class_id)
+    if layout is not None and layout.cells:
+        schedule, orientation = layout.schedule, layout.orientation
+    else:
+        schedule, orientation = parser.parse_schedule_from_text(result.text, class_id=class_id), None
+    confidence = sum(line.conf for line in result.lines) / len(result.lines) if result.lines else 0.0
+    return page, schedule.to_bytes(), result.text, confidence, orientation, time.perf_counter() - start
+
+
+def iter_document_schedules(path: str, dpi: int = DEFAULT_DPI, workers: Optional[int] = None,
+                            turno: str = "manha", executor: Optional[Executor] = None) -> Iterator[PageSchedule]:
+    """
+    Lê um PDF/TIFF de várias páginas (uma turma por página) e gera cada horário assim que a página fica pronta
+
+    Cada processo rasteriza só a sua página, e no máximo 2 páginas por processo ficam em andamento,
+    então o documento nunca fica inteiro na memória. A ordem de saída é a de término, não a das páginas.
+    Com executor, as páginas vão para esse pool (compartilhado, ex.: o do service.py) em vez de um pool próprio.
+    """
+    total = page_count(path)
+    if total == 0:
+        logger.warning(f"Documento {path} sem páginas")
+        return
+    document = document_key(path)
+    workers = workers or min(os.cpu_count() or 1, total)
+    logger.info(f"Documento {path}: {total} páginas, {workers} processos")
+
+    pages = iter(range(1, total + 1))
+    pool = executor or ProcessPoolExecutor(max_workers=workers)
+    pending = {}
+    try:
+        for page in pages:
+            pending[pool.submit(_ocr_page, path, page, dpi, turno, document)] = page
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = pending.pop(future)
+                next_page = next(pages, None)
+                if next_page is not None:
+                    pending[pool.submit(_ocr_page, path, next_page, dpi, turno, document)] = next_page
+                try:
+                    page, data, text, confidence, orientation, elapsed = future.result()
+                except Exception as e:
+                    # Uma página ilegível não interrompe o documento
+                    metrics.inc("document_page_errors")
+                    logger.error(f"Erro ao processar a página {page} de {path}: {e}")
+                    continue
+                metrics.inc("document_pages")
+                metrics.observe("ocr_page", elapsed)
+                yield PageSchedule(page, Schedule.from_bytes(data), text, confidence, orientation)
+    finally:
+        # Se quem consome parar antes do fim, as páginas ainda na fila são descartadas
+        if executor is None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            for future in pending:
+                future.cancel()
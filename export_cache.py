@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Política de retenção padrão da pasta output/
+CACHE_MAX_FILES = 200
+CACHE_MAX_AGE_DAYS = 30
+
+# Versão do formato: mudar quando o .ics gerado mudar, para invalidar o cache antigo
+CACHE_VERSION = 2
+
+
+class ExportArtifact(NamedTuple):
+    """
+    Arquivo exportado: caminho, ETag (para servir o arquivo) e se veio do cache
+    """
+    path: str
+    etag: str
+    cached: bool
+
+
+def schedule_key(schedule, end_date: str, **options) -> str:
+    """
+    Hash estável do horário (matérias e turma), da data final e das opções que mudam os eventos
+
+    Não depende da data de hoje: o mesmo horário tem a mesma chave (e o mesmo ETag) em qualquer dia.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"version": CACHE_VERSION, "end_date": end_date, "options": options},
+                             sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    digest.update(schedule.to_bytes())
+    return digest.hexdigest()
+
+
+def make_etag(key: str, suffix: str = "") -> str:
+    """
+    ETag forte a partir da chave do horário; suffix distingue outras codificações do mesmo conteúdo
+    """
+    return f'"{key[:32]}{suffix}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Compara o If-None-Match com o ETag (comparação fraca, como pede a RFC 9110 para GET)
+    """
+    if not header:
+        return False
+    etag = etag.removeprefix("W/")
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def safe_class_id(class_id: str) -> str:
+    """
+    Turma em uma forma segura para nomes de arquivo (só letras, dígitos, _ e -)
+    """
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', class_id)
+
+
+class ExportCache:
+    """
+    Cache de arquivos exportados endereçado pelo conteúdo
+
+    O nome do arquivo leva o hash, então uma exportação idêntica reaproveita o arquivo existente.
+    Após cada gravação só saem os arquivos mais antigos que max_age_days; o limite de max_files
+    é aplicado ao abrir o cache, entre uma execução e outra, para nunca apagar um arquivo que a
+    execução atual acabou de gravar (os menos usados saem primeiro: um acerto renova a data do arquivo).
+    """
+
+    def __init__(self, directory: str = "output", suffix: str = ".ics",
+                 max_files: int = CACHE_MAX_FILES, max_age_days: Optional[float] = CACHE_MAX_AGE_DAYS):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.suffix = suffix
+        self.max_files = max_files
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self.evict()
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return make_etag(key)
+
+    def path_for(self, key: str, prefix: str = "calendario") -> Path:
+        return self.directory / f"{prefix}_{key[:16]}{self.suffix}"
+
+    def get(self, key: str, prefix: str = "calendario") -> Optional[ExportArtifact]:
+        """
+        Retorna o arquivo já exportado para a chave, se existir
+        """
+        path = self.path_for(key, prefix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            metrics.inc("export_cache_misses")
+            return None
+        metrics.inc("export_cache_hits")
+        return ExportArtifact(str(path), self.etag(key), True)
+
+    def put(self, key: str, content: str, prefix: str = "calendario") -> ExportArtifact:
+        """
+        Grava o conteúdo de forma atômica e remove os arquivos vencidos
+        """
+        path = self.path_for(key, prefix)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict(age_only=True)
+        return ExportArtifact(str(path), self.etag(key), False)
+
+    def evict(self, age_only: bool = False) -> int:
+        """
+        Remove os arquivos vencidos (e os excedentes, se age_only for falso); retorna quantos foram removidos
+        """
+        with self._lock:
+            files = []
+            for path in self.directory.glob(f"*{self.suffix}"):
+                try:
+                    files.append((path.stat().st_mtime, path))
+                except FileNotFoundError:
+                    continue
+            files.sort(reverse=True)
+
+            cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days is not None else None
+            removed = 0
+            for position, (mtime, path) in enumerate(files):
+                if (not age_only and position >= self.max_files) or (cutoff is not None and mtime < cutoff):
+                    try:
+                        path.unlink()
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+        if removed:
+            metrics.inc("export_cache_evictions", removed)
+            logger.info(f"{removed} arquivos antigos removidos de {self.directory}")
+        return removed
@@ -0,0 +1,454 @@
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+
+logger = logging.getLogger(__name__)
+
+# IDs de evento aceitos pela API: base32hex minúsculo, de 5 a 1024 caracteres
+EVENT_ID_PATTERN = re.compile(r'^[a-v0-9]{5,1024}$')
+
+EVENTS_PATH = re.compile(r'^/calendar/v3/calendars/([^/]+)/events(?:/([^/]+))?$')
+BATCH_PATH = '/batch/calendar/v3'
+
+
+class FakeApiError(Exception):
+    """
+    Erro no formato devolvido pela API do Google Calendar
+    """
+
+    def __init__(self, status: int, reason: str, message: str, domain: str = "global"):
+        super().__init__(message)
+        self.status = status
+        # Mesmo formato do HttpError do googleapiclient (e.resp.status)
+        self.resp = SimpleNamespace(status=status)
+        self.reason = reason
+        self.domain = domain
+
+    def to_json(self) -> Dict:
+        return {
+            "error": {
+                "code": self.status,
+                "message": str(self),
+                "errors": [{"domain": self.domain, "reason": self.reason, "message": str(self)}],
+            }
+        }
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class FakeCalendarBackend:
+    """
+    Armazenamento em memória com o subconjunto da API Calendar v3 usado pelo projeto
+
+    Conta as chamadas por operação e mantém um log de alterações para os sync tokens.
+    """
+
+    def __init__(self, page_size: int = 250):
+        self.page_size = page_size
+        self.calls = Counter()
+        self.calendars: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.RLock()
+        # Log de alterações (calendário, id); o sync token é "<época>-<posição nesse log>"
+        self._changes: List[Tuple[str, str]] = []
+        # Tokens de épocas anteriores respondem 410 (sincronização completa necessária)
+        self._sync_epoch = 0
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.calendars.clear()
+            self._changes.clear()
+            self._sync_epoch += 1
+
+    def expire_sync_tokens(self):
+        """
+        Invalida todos os sync tokens emitidos até agora, como a API faz periodicamente
+        """
+        with self._lock:
+            self._sync_epoch += 1
+
+    def insert(self, calendar_id: str, body: Dict) -> Dict:
+        with self._lock:
+            self.calls['insert'] += 1
+            events = self.calendars.setdefault(calendar_id, {})
+            event = dict(body)
+            event_id = event.get('id')
+            if event_id is None:
+                event_id = event['id'] = uuid.uuid4().hex
+            elif not EVENT_ID_PATTERN.match(event_id):
+                raise FakeApiError(400, "invalid", f"Invalid resource id value: {event_id}")
+            elif event_id in events:
+                raise FakeApiError(409, "duplicate", "The requested identifier already exists.")
+            event['status'] = 'confirmed'
+            event['updated'] = datetime.now(timezone.utc).isoformat()
+            events[event_id] = event
+            self._changes.append((calendar_id, event_id))
+            return dict(event)
+
+    def get(self, calendar_id: str, event_id: str) -> Dict:
+        with self._lock:
+            self.calls['get'] += 1
+            event = self.calendars.get(calendar_id, {}).get(event_id)
+            if event is None:
+                raise FakeApiError(404, "notFound", "Not Found")
+            return dict(event)
+
+    def delete(self, calendar_id: str, event_id: str):
+        with self._lock:
+            self.calls['delete'] += 1
+            event = self.calendars.get(calendar_id, {}).get(event_id)
+            if event is None:
+                raise FakeApiError(404, "notFound", "Not Found")
+            if event['status'] == 'cancelled':
+                raise FakeApiError(410, "deleted", "Resource has been deleted")
+            event['status'] = 'cancelled'
+            event['updated'] = datetime.now(timezone.utc).isoformat()
+            self._changes.append((calendar_id, event_id))
+
+    def list(self, calendar_id: str, params: Dict) -> Dict:
+        """
+        events.list com paginação, sync tokens, privateExtendedProperty e timeMin/timeMax
+        """
+        with self._lock:
+            self.calls['list'] += 1
+            events = self.calendars.get(calendar_id, {})
+            sync_token = params.get('syncToken')
+            if sync_token is not None:
+                epoch, _, position = sync_token.partition('-')
+                if epoch != str(self._sync_epoch) or not position.isdigit() or int(position) > len(self._changes):
+                    raise FakeApiError(410, "fullSyncRequired", "Sync token is no longer valid, a full sync is required.")
+                changed = dict.fromkeys(
+                    event_id for cal, event_id in self._changes[int(position):] if cal == calendar_id
+                )
+                items = [events[event_id] for event_id in changed]
+            elif _as_bool(params.get('showDeleted')):
+                items = list(events.values())
+            else:
+                items = [event for event in events.values() if event['status'] != 'cancelled']
+
+            filters = params.get('privateExtendedProperty') or []
+            if isinstance(filters, str):
+                filters = [filters]
+            if filters:
+                wanted = dict(f.split('=', 1) for f in filters)
+                items = [
+                    event for event in items
+                    if all(event.get('extendedProperties', {}).get('private', {}).get(k) == v for k, v in wanted.items())
+                ]
+            if params.get('timeMin') and sync_token is None:
+                time_min = _parse_time(params['timeMin'])
+                items = [event for event in items if 'recurrence' in event or self._event_end(event) >= time_min]
+            if params.get('timeMax') and sync_token is None:
+                time_max = _parse_time(params['timeMax'])
+                items = [event for event in items if self._event_start(event) < time_max]
+
+            start = int(params.get('pageToken') or 0)
+            page_size = min(int(params.get('maxResults') or self.page_size), self.page_size)
+            result = {'kind': 'calendar#events', 'items': [dict(event) for event in items[start:start + page_size]]}
+            if start + page_size < len(items):
+                result['nextPageToken'] = str(start + page_size)
+            else:
+                result['nextSyncToken'] = f"{self._sync_epoch}-{len(self._changes)}"
+            return result
+
+    @staticmethod
+    def _event_start(event: Dict) -> datetime:
+        start = event.get('start', {})
+        return _parse_time(start.get('dateTime') or start.get('date'))
+
+    @staticmethod
+    def _event_end(event: Dict) -> datetime:
+        end = event.get('end', {})
+        return _parse_time(end.get('dateTime') or end.get('date'))
+
+
+def _as_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.lower() == 'true'
+    return bool(value)
+
+
+class _Request:
+    """
+    Imita um HttpRequest do googleapiclient: só executa ao chamar execute()
+    """
+
+    def __init__(self, func):
+        self._func = func
+
+    def execute(self):
+        return self._func()
+
+
+class _Batch:
+    """
+    Imita o BatchHttpRequest do googleapiclient para o serviço em memória
+    """
+
+    def __init__(self, callback=None):
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request_id or str(len(self._requests)), request, callback or self._callback))
+
+    def execute(self):
+        for request_id, request, callback in self._requests:
+            try:
+                response, exception = request.execute(), None
+            except FakeApiError as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class _Events:
+    def __init__(self, backend: FakeCalendarBackend):
+        self._backend = backend
+
+    def insert(self, calendarId: str, body: Dict):
+        return _Request(lambda: self._backend.insert(calendarId, body))
+
+    def get(self, calendarId: str, eventId: str):
+        return _Request(lambda: self._backend.get(calendarId, eventId))
+
+    def delete(self, calendarId: str, eventId: str):
+        return _Request(lambda: self._backend.delete(calendarId, eventId) or '')
+
+    def list(self, calendarId: str, **params):
+        return _Request(lambda: self._backend.list(calendarId, params))
+
+
+class FakeCalendarService:
+    """
+    Substituto em memória do objeto service do googleapiclient (sem HTTP)
+    """
+
+    def __init__(self, backend: Optional[FakeCalendarBackend] = None):
+        self.backend = backend or FakeCalendarBackend()
+
+    @property
+    def calls(self) -> Counter:
+        return self.backend.calls
+
+    def reset_calls(self):
+        self.backend.calls.clear()
+
+    def events(self):
+        return _Events(self.backend)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(callback)
+
+
+class FakeCalendarServer(ThreadingHTTPServer):
+    """
+    Servidor HTTP local que implementa o subconjunto da API Calendar v3 usado pelo projeto
+
+    Suporta latência configurável, injeção de erros 5xx e emulação de quota
+    (limite por segundo e limite total, respondendo 403 como a API real).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, error_rate: float = 0.0,
+                 quota_per_second: Optional[float] = None, quota_total: Optional[int] = None,
+                 seed: Optional[int] = None, backend: Optional[FakeCalendarBackend] = None):
+        super().__init__((host, port), _FakeCalendarHandler)
+        self.backend = backend or FakeCalendarBackend()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota_per_second = quota_per_second
+        self.quota_total = quota_total
+        self._random = random.Random(seed)
+        self._quota_lock = threading.Lock()
+        self._tokens = quota_per_second or 0.0
+        self._last_refill = time.monotonic()
+        self._total_requests = 0
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FakeCalendarServer":
+        """
+        Inicia o servidor em uma thread em segundo plano
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"API falsa do Google Calendar em {self.url}")
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def admit(self):
+        """
+        Aplica quota e injeção de erros a uma chamada da API (cada item de um batch conta)
+        """
+        with self._quota_lock:
+            self._total_requests += 1
+            if self.quota_total is not None and self._total_requests > self.quota_total:
+                raise FakeApiError(403, "quotaExceeded", "Calendar usage limits exceeded.", domain="usageLimits")
+            if self.quota_per_second:
+                now = time.monotonic()
+                self._tokens = min(self.quota_per_second,
+                                   self._tokens + (now - self._last_refill) * self.quota_per_second)
+                self._last_refill = now
+                if self._tokens < 1:
+                    raise FakeApiError(403, "rateLimitExceeded", "Rate Limit Exceeded", domain="usageLimits")
+                self._tokens -= 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise FakeApiError(503, "backendError", "Backend Error")
+
+    def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Optional[Dict]]:
+        """
+        Executa uma chamada da API e devolve (status, corpo JSON)
+        """
+        parts = urlsplit(target)
+        match = EVENTS_PATH.match(parts.path)
+        try:
+            if not match:
+                raise FakeApiError(404, "notFound", f"Not Found: {parts.path}")
+            self.admit()
+            calendar_id, event_id = unquote(match.group(1)), match.group(2) and unquote(match.group(2))
+            query = {k: v if len(v) > 1 else v[0] for k, v in parse_qs(parts.query).items()}
+            if method == 'POST' and event_id is None:
+                return 200, self.backend.insert(calendar_id, json.loads(body or b'{}'))
+            if method == 'GET' and event_id is None:
+                return 200, self.backend.list(calendar_id, query)
+            if method == 'GET':
+                return 200, self.backend.get(calendar_id, event_id)
+            if method == 'DELETE' and event_id is not None:
+                self.backend.delete(calendar_id, event_id)
+                return 204, None
+            raise FakeApiError(405, "methodNotAllowed", f"{method} não suportado em {parts.path}")
+        except FakeApiError as e:
+            return e.status, e.to_json()
+
+    def dispatch_batch(self, content_type: str, body: bytes) -> Tuple[str, bytes]:
+        """
+        Executa um batch multipart/mixed e devolve (content-type, corpo) da resposta
+        """
+        message = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        chunks = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition('\r\n' if '\r\n' in part.get_payload() else '\n')
+            method, target, _ = request_line.split(' ', 2)
+            separator = '\r\n\r\n' if '\r\n\r\n' in rest else '\n\n'
+            _, _, inner_body = rest.partition(separator)
+            status, payload = self.dispatch(method, target, inner_body.encode('utf-8'))
+            content_id = part['Content-ID'].strip()[1:-1]
+            response_body = json.dumps(payload) if payload is not None else ''
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {_reason(status)}\r\nContent-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(response_body.encode('utf-8'))}\r\n\r\n{response_body}\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(chunks).encode('utf-8')
+
+
+def _reason(status: int) -> str:
+    return BaseHTTPRequestHandler.responses.get(status, ("",))[0]
+
+
+class _FakeCalendarHandler(BaseHTTPRequestHandler):
+    server: FakeCalendarServer
+    protocol_version = "HTTP/1.1"
+    # Cabeçalhos e corpo saem em writes separados; sem isso o keep-alive esbarra no delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        body = self._read_body()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        path = urlsplit(self.path).path
+        if path == '/_fake/stats':
+            payload = {"calls": dict(self.server.backend.calls)}
+            self._send(200, 'application/json', json.dumps(payload).encode('utf-8'))
+            return
+        if path == '/_fake/reset' and self.command == 'POST':
+            self.server.backend.reset()
+            self._send(204, 'application/json', b'')
+            return
+        if path == BATCH_PATH and self.command == 'POST':
+            self.server.backend.calls['batch'] += 1
+            content_type, payload = self.server.dispatch_batch(self.headers.get('Content-Type', ''), body)
+            self._send(200, content_type, payload)
+            return
+
+        status, payload = self.server.dispatch(self.command, self.path, body)
+        response = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self._send(status, 'application/json; charset=UTF-8', response)
+
+    do_GET = do_POST = do_DELETE = _handle
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="API falsa do Google Calendar para testes de carga e uso offline")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="atraso por requisição HTTP, em segundos")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="fração de chamadas que respondem 503")
+    arg_parser.add_argument("--quota-per-second", type=float, help="chamadas por segundo antes de responder 403")
+    arg_parser.add_argument("--quota-total", type=int, help="total de chamadas antes de responder 403")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FakeCalendarServer(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                                quota_per_second=args.quota_per_second, quota_total=args.quota_total)
+    logger.info(f"API falsa do Google Calendar em {server.url}")
+    logger.info(f"Use CALENDAR_API_BASE_URL={server.url} para apontar o gerador para ela")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
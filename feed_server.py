@@ -0,0 +1,338 @@
+import gzip
+import json
+import os
+import struct
+import argparse
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+from export_cache import etag_matches, make_etag, schedule_key
+from metrics import metrics
+from schedule import Schedule
+
+logger = logging.getLogger(__name__)
+
+FEED_STORE_DIR = "feeds"
+FEED_PATH_PREFIX = "/feeds/"
+
+# Quantos feeds renderizados ficam em memória e por quanto tempo os clientes podem reusá-los
+FEED_CACHE_SIZE = 2048
+FEED_MAX_AGE = 900
+
+# Formato do arquivo de cada turma: "FED1", data final (AAAA-MM-DD) e o Schedule.to_bytes()
+_FEED_HEADER = struct.Struct("<4s10s")
+_FEED_MAGIC = b"FED1"
+
+
+class FeedStore:
+    """
+    Horários guardados em disco, um arquivo binário por turma, para servir como feeds .ics
+    """
+
+    def __init__(self, directory: str = FEED_STORE_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, class_id: str) -> Path:
+        return self.directory / f"{quote(class_id, safe='')}.sch"
+
+    def put(self, schedule: Schedule, end_date: str):
+        """
+        Guarda (ou substitui) o horário da turma
+        """
+        if not schedule.class_id:
+            raise ValueError("O horário precisa de uma turma (class_id) para virar um feed")
+        data = _FEED_HEADER.pack(_FEED_MAGIC, end_date.encode("ascii")) + schedule.to_bytes()
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self._path(schedule.class_id))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get(self, class_id: str) -> Optional[Tuple[Schedule, str]]:
+        """
+        Retorna (horário, data final) da turma, ou None se ela não existir
+        """
+        try:
+            data = self._path(class_id).read_bytes()
+        except FileNotFoundError:
+            return None
+        magic, end_date = _FEED_HEADER.unpack_from(data)
+        if magic != _FEED_MAGIC:
+            raise ValueError(f"Arquivo de feed inválido para a turma {class_id}")
+        return Schedule.from_bytes(data[_FEED_HEADER.size:]), end_date.decode("ascii")
+
+    def version(self, class_id: str) -> Optional[int]:
+        """
+        Versão do horário guardado (muda a cada put); None se a turma não existir
+        """
+        try:
+            return self._path(class_id).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def delete(self, class_id: str) -> bool:
+        try:
+            self._path(class_id).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def class_ids(self) -> Iterator[str]:
+        for path in sorted(self.directory.glob("*.sch")):
+            yield unquote(path.stem)
+
+
+class RenderedFeed(NamedTuple):
+    """
+    Feed pronto para servir: corpo em texto puro e em gzip, cada um com seu ETag
+
+    Os dois corpos têm bytes diferentes, então não podem dividir um ETag forte.
+    """
+    version: Tuple
+    etag: str
+    body: bytes
+    gzip_body: bytes
+    gzip_etag: str
+
+
+class FeedCache:
+    """
+    Feeds renderizados em memória (LRU), invalidados quando o horário ou o dia mudam
+
+    A data entra na versão porque a primeira ocorrência de cada aula é calculada a partir de hoje.
+    """
+
+    def __init__(self, store: FeedStore, generator=None, max_entries: int = FEED_CACHE_SIZE):
+        if generator is None:
+            from main import CalendarGenerator
+            generator = CalendarGenerator()
+        self.store = store
+        self.generator = generator
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, RenderedFeed]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Um lock por turma evita que vários clientes renderizem o mesmo feed ao mesmo tempo
+        self._render_locks: dict = {}
+
+    def get(self, class_id: str) -> Optional[RenderedFeed]:
+        stored_version = self.store.version(class_id)
+        if stored_version is None:
+            return None
+        version = (stored_version, date.today().toordinal())
+
+        with self._lock:
+            feed = self._entries.get(class_id)
+            if feed is not None and feed.version == version:
+                self._entries.move_to_end(class_id)
+                metrics.inc("feed_cache_hits")
+                return feed
+            render_lock = self._render_locks.setdefault(class_id, threading.Lock())
+
+        with render_lock:
+            with self._lock:
+                feed = self._entries.get(class_id)
+                if feed is not None and feed.version == version:
+                    return feed
+            feed = self._render(class_id, version)
+            if feed is None:
+                return None
+            with self._lock:
+                self._entries[class_id] = feed
+                self._entries.move_to_end(class_id)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._render_locks.pop(evicted, None)
+            return feed
+
+    def _render(self, class_id: str, version: Tuple) -> Optional[RenderedFeed]:
+        stored = self.store.get(class_id)
+        if stored is None:
+            return None
+        schedule, end_date = stored
+        metrics.inc("feed_cache_misses")
+        with metrics.timer("feed_render"):
+            compiled = self.generator.compile_events(schedule, end_date)
+            key = schedule_key(schedule, end_date, **self.generator.export_options())
+            body = self.generator.render_ics(compiled, class_id).encode("utf-8")
+            # mtime=0 deixa o gzip determinístico
+            gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        return RenderedFeed(version, make_etag(key), body, gzip_body, make_etag(key, "-gz"))
+
+    def invalidate(self, class_id: Optional[str] = None):
+        with self._lock:
+            if class_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(class_id, None)
+
+
+def _accepts_gzip(header: Optional[str]) -> bool:
+    for coding in (header or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        return quality > 0
+    return False
+
+
+class FeedServer(ThreadingHTTPServer):
+    """
+    Servidor HTTP de feeds .ics por turma (GET /feeds/<turma>.ics)
+
+    Os feeds ficam em cache em memória já comprimidos; clientes que mandam If-None-Match
+    recebem 304 sem corpo, então o polling de milhares de assinantes custa quase nada.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, store: FeedStore, host: str = "127.0.0.1", port: int = 0, generator=None,
+                 cache_size: int = FEED_CACHE_SIZE, max_age: int = FEED_MAX_AGE):
+        super().__init__((host, port), _FeedHandler)
+        self.store = store
+        self.cache = FeedCache(store, generator, cache_size)
+        self.max_age = max_age
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def feed_url(self, class_id: str) -> str:
+        return f"{self.url.rstrip('/')}{FEED_PATH_PREFIX}{quote(class_id, safe='')}.ics"
+
+    def start(self) -> "FeedServer":
+        """
+        Inicia o servidor em uma thread em segundo plano
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Feeds .ics em {self.url}")
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _FeedHandler(BaseHTTPRequestHandler):
+    server: FeedServer
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send(self, status: int, headers: List[Tuple[str, str]], body: bytes = b''):
+        metrics.inc("feed_requests", status=status)
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        path = unquote(urlsplit(self.path).path)
+        if path in ("/", FEED_PATH_PREFIX):
+            feeds = [
+                {"turma": class_id, "url": self.server.feed_url(class_id)}
+                for class_id in self.server.store.class_ids()
+            ]
+            self._send(200, [('Content-Type', 'application/json; charset=utf-8')],
+                       json.dumps(feeds, ensure_ascii=False).encode('utf-8'))
+            return
+        if not (path.startswith(FEED_PATH_PREFIX) and path.endswith(".ics")):
+            self._send(404, [('Content-Type', 'text/plain; charset=utf-8')], b'Not Found')
+            return
+
+        class_id = path[len(FEED_PATH_PREFIX):-len(".ics")]
+        feed = self.server.cache.get(class_id)
+        if feed is None:
+            self._send(404, [('Content-Type', 'text/plain; charset=utf-8')], f"Turma {class_id} não encontrada".encode('utf-8'))
+            return
+
+        gzipped = _accepts_gzip(self.headers.get('Accept-Encoding'))
+        etag = feed.gzip_etag if gzipped else feed.etag
+        headers = [
+            ('ETag', etag),
+            ('Cache-Control', f'public, max-age={self.server.max_age}'),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self._send(304, headers)
+            return
+
+        headers.append(('Content-Type', 'text/calendar; charset=utf-8'))
+        if gzipped:
+            headers.append(('Content-Encoding', 'gzip'))
+            self._send(200, headers, feed.gzip_body)
+        else:
+            self._send(200, headers, feed.body)
+
+    do_HEAD = do_GET
+
+
+def main():
+    from ingest import iter_schedules
+
+    arg_parser = argparse.ArgumentParser(description="Servidor de feeds .ics por turma para assinatura em apps de calendário")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    arg_parser.add_argument("--store", default=FEED_STORE_DIR, help="pasta com os horários guardados")
+    arg_parser.add_argument("--import", dest="import_path", help="planilha .csv/.xlsx da escola a guardar antes de servir")
+    arg_parser.add_argument("--end-date", help="data final dos eventos importados (AAAA-MM-DD)")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = FeedStore(args.store)
+    if args.import_path:
+        if not args.end_date:
+            arg_parser.error("--import exige --end-date")
+        count = 0
+        for schedule in iter_schedules(args.import_path):
+            store.put(schedule, args.end_date)
+            count += 1
+        logger.info(f"{count} turmas guardadas em {args.store}")
+
+    server = FeedServer(store, args.host, args.port)
+    logger.info(f"Feeds .ics em {server.url}feeds/<turma>.ics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
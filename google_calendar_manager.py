@@ -1,9 +1,12 @@
 import os
 import json
+import uuid
 from datetime import datetime, timedelta, timezone, time
 from typing import List, Dict, Optional
+from urllib.parse import urljoin
 
 import logging
+from metrics import metrics, log_event
 logger = logging.getLogger(__name__)
 
 DIA_COR = {
@@ -14,14 +17,44 @@ DIA_COR = {
     "sexta": "5"     # amarelo
 }
 
+# Propriedades privadas que marcam os eventos criados por este gerador
+APP_PROPERTY = "generator"
+APP_TAG = "calendar-generator"
+
+# Arquivo com os sync tokens e o espelho local dos eventos
+SYNC_STATE_FILE = "calendar_sync_state.json"
+
+# URL de uma API compatível (ex.: fake_calendar_server.py) usada no lugar do Google
+API_BASE_URL_ENV = "CALENDAR_API_BASE_URL"
+
+# Quantidade de chamadas por requisição batch
+BATCH_SIZE = 50
+
+class DeletedEventIdError(Exception):
+    """
+    O ID pedido pertence a um evento apagado (a API responde 409 e não deixa reusar o ID)
+    """
+    def __init__(self, event_id: str):
+        super().__init__(f"O ID {event_id} pertence a um evento apagado")
+        self.event_id = event_id
+
 class GoogleCalendarManager:
     """
     Gerencia eventos no Google Calendar
     """
     
-    def __init__(self):
+    def __init__(self, run_id: Optional[str] = None, sync_state_file: str = SYNC_STATE_FILE, base_url: Optional[str] = None):
         self.service = None
         self.calendar_id = 'primary'
+        # Com base_url, as chamadas vão para uma API local em vez do Google (sem OAuth)
+        self.base_url = base_url or os.environ.get(API_BASE_URL_ENV)
+        self._events_service = None
+        self._events_resource = None
+        # Identifica a execução que criou os eventos
+        self.run_id = run_id or uuid.uuid4().hex
+        # Sync tokens e espelho local dos eventos, por calendário
+        self.sync_state_file = sync_state_file
+        self._sync_state = None
         
     def authenticate(self):
         """
@@ -33,6 +66,11 @@ class GoogleCalendarManager:
             from googleapiclient.discovery import build
             from google.auth.transport.requests import Request
             
+            if self.base_url:
+                self.service = self._build_local_service()
+                logger.info(f"✅ Usando API do Calendar em {self.base_url}")
+                return
+            
             SCOPES = ['https://www.googleapis.com/auth/calendar']
             CREDENTIALS_FILE = 'credentials.json'
             TOKEN_FILE = 'token.json'
@@ -91,9 +129,12 @@ class GoogleCalendarManager:
             logger.error(f"❌ Erro na autenticação: {e}")
             raise
     
-    def create_event(self, title: str, start_time: datetime, end_time: datetime, dia_semana: str, recurrence: List[str] = None, until: datetime = None) -> str:
+    def create_event(self, title: str, start_time: datetime, end_time: datetime, dia_semana: str, recurrence: List[str] = None, until: datetime = None, class_id: str = None, slot: int = None, event_id: str = None) -> str:
         """
         Cria um novo evento no Google Calendar
+        
+        Com event_id (base32hex), a criação é idempotente: se o ID já existir (409), o evento conta como criado.
+        Se o ID for de um evento apagado, levanta DeletedEventIdError (a API não recria o evento).
         """
         if not self.service:
             self.authenticate()
@@ -104,109 +145,180 @@ class GoogleCalendarManager:
             'start': {'dateTime': start_time.isoformat(), 'timeZone': 'America/Sao_Paulo'},
             'end': {'dateTime': end_time.isoformat(), 'timeZone': 'America/Sao_Paulo'},
             'colorId': color_id,
+            'extendedProperties': {
+                'private': self._private_properties(dia_semana, class_id, slot)
+            },
         }
+        if event_id:
+            event['id'] = event_id
         if recurrence and until:
             event['recurrence'] = [f"RRULE:FREQ=WEEKLY;UNTIL={until.strftime('%Y%m%dT%H%M%SZ')}"]
+        elif recurrence:
+            event['recurrence'] = recurrence
         
         try:
-            created_event = self.service.events().insert(
+            created_event = self._execute('insert', self._events().insert(
                 calendarId=self.calendar_id,
                 body=event
-            ).execute()
+            ))
             
-            logger.info(f"✅ Evento criado: {title} - {dia_semana} ({created_event['id']})")
+            log_event(logger, f"✅ Evento criado: {title} - {dia_semana} ({created_event['id']})")
             return created_event['id']
             
         except Exception as e:
+            if event_id and getattr(getattr(e, 'resp', None), 'status', None) == 409:
+                metrics.inc("calendar_event_conflicts")
+                # O 409 também vale para IDs de eventos apagados, que continuam reservados
+                existing = self._execute('get', self._events().get(calendarId=self.calendar_id, eventId=event_id))
+                if existing.get('status') == 'cancelled':
+                    raise DeletedEventIdError(event_id) from e
+                log_event(logger, f"Evento já existente: {title} - {dia_semana} ({event_id})")
+                return event_id
             logger.error(f"Erro ao criar evento: {e}")
             raise
     
-    def delete_events_by_description(self, description_pattern: str = "[ESCOLA] [HORARIO_ESCOLAR]", start_date: datetime = None):
+    def _events(self):
         """
-        Deleta eventos que contenham o padrão na descrição a partir de start_date
+        Recurso events() do service, reaproveitado (o googleapiclient recria o recurso a cada chamada)
         """
-        if not self.service:
-            self.authenticate()
+        if self._events_service is not self.service:
+            self._events_resource = self.service.events()
+            self._events_service = self.service
+        return self._events_resource
+
+    def _build_local_service(self):
+        """
+        Cria o service apontando para a API local configurada em base_url
+        """
+        import httplib2
+        from googleapiclient.discovery import build
         
-        if start_date is None:
-            start_date = datetime.now(timezone.utc)
+        return build(
+            'calendar', 'v3',
+            http=httplib2.Http(),
+            static_discovery=True,
+            client_options={'api_endpoint': urljoin(self.base_url, 'calendar/v3/')}
+        )
+
+    def _new_batch(self, callback=None):
+        """
+        Cria uma requisição batch (o endpoint de batch não segue o api_endpoint, por isso é ajustado aqui)
+        """
+        if self.base_url and not hasattr(self.service, 'backend'):
+            from googleapiclient.http import BatchHttpRequest
+            return BatchHttpRequest(callback=callback, batch_uri=urljoin(self.base_url, 'batch/calendar/v3'))
+        return self.service.new_batch_http_request(callback=callback)
+
+    def _execute_batch(self, operation: str, requests: List) -> List:
+        """
+        Executa as requisições em batches de BATCH_SIZE e devolve (resposta, exceção) de cada uma, na ordem
+        """
+        results = [(None, None)] * len(requests)
         
-        try:
-            # Busca eventos com o padrão na descrição
-            events_result = self.service.events().list(
+        def collect(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+        
+        for start in range(0, len(requests), BATCH_SIZE):
+            batch = self._new_batch(callback=collect)
+            for i, request in enumerate(requests[start:start + BATCH_SIZE], start):
+                batch.add(request, request_id=str(i))
+            with metrics.timer("calendar_api", operation="batch"):
+                batch.execute()
+            metrics.inc("calendar_api_calls", operation="batch")
+        metrics.inc("calendar_api_batched_calls", len(requests), operation=operation)
+        return results
+
+    def _execute(self, operation: str, request):
+        """
+        Executa uma requisição da API medindo a latência por operação
+        """
+        with metrics.timer("calendar_api", operation=operation):
+            response = request.execute()
+        metrics.inc("calendar_api_calls", operation=operation)
+        return response
+
+    def _private_properties(self, dia_semana: str, class_id: str = None, slot: int = None) -> Dict[str, str]:
+        """
+        Monta as propriedades privadas gravadas em cada evento criado
+        """
+        properties = {
+            APP_PROPERTY: APP_TAG,
+            'run_id': self.run_id,
+            'dia_semana': dia_semana.lower(),
+        }
+        if class_id is not None:
+            properties['class_id'] = str(class_id)
+        if slot is not None:
+            properties['slot'] = str(slot)
+        return properties
+
+    def _private_property_filters(self, **properties) -> List[str]:
+        """
+        Monta os filtros privateExtendedProperty que identificam os eventos do gerador
+        """
+        filters = [f"{APP_PROPERTY}={APP_TAG}"]
+        for key, value in properties.items():
+            if value is not None:
+                filters.append(f"{key}={value}")
+        return filters
+
+    def _list_pages(self, **params):
+        """
+        Percorre todas as páginas de uma listagem de eventos
+        """
+        page_token = None
+        while True:
+            events_result = self._execute('list', self._events().list(
                 calendarId=self.calendar_id,
-                q=description_pattern,
-                maxResults=1000
-            ).execute()
-            
-            events = events_result.get('items', [])
-            deleted_count = 0
-            
-            for event in events:
-                event_start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date')))
-                # event_start = ... (já deve estar com tzinfo=timezone.utc)
-                if event_start >= start_date:
-                    try:
-                        self.service.events().delete(
-                            calendarId=self.calendar_id,
-                            eventId=event['id']
-                        ).execute()
-                        deleted_count += 1
-                        logger.info(f"Evento deletado: {event.get('summary', 'Sem título')}")
-                    except Exception as e:
-                        logger.error(f"Erro ao deletar evento {event.get('id')}: {e}")
-            
-            logger.info(f"Total de eventos deletados: {deleted_count}")
-            return deleted_count
-            
-        except Exception as e:
-            logger.error(f"Erro ao buscar/deletar eventos: {e}")
-            raise
-    
-    def list_events_by_description(self, description_pattern: str = "[ESCOLA] [HORARIO_ESCOLAR]"):
+                pageToken=page_token,
+                **params
+            ))
+            yield from events_result.get('items', [])
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                break
+
+    def list_school_events(self, class_id: str = None, run_id: str = None, dia_semana: str = None, single_events: bool = False) -> List[Dict]:
         """
-        Lista eventos que contenham o padrão de descrição especificado
+        Lista os eventos criados pelo gerador, filtrando pelas propriedades privadas
         """
         if not self.service:
             self.authenticate()
         
+        filters = self._private_property_filters(class_id=class_id, run_id=run_id, dia_semana=dia_semana)
         try:
-            events_result = self.service.events().list(
-                calendarId=self.calendar_id,
-                q=description_pattern,
-                maxResults=1000
-            ).execute()
-            
-            events = events_result.get('items', [])
-            logger.info(f"Encontrados {len(events)} eventos com padrão '{description_pattern}'")
-            
-            for event in events:
-                logger.info(f"- {event.get('summary', 'Sem título')} ({event.get('id')})")
-            
+            events = list(self._list_pages(
+                privateExtendedProperty=filters,
+                singleEvents=single_events,
+                maxResults=250
+            ))
+            logger.info(f"Encontrados {len(events)} eventos com filtros {filters}")
             return events
             
         except Exception as e:
             logger.error(f"Erro ao listar eventos: {e}")
             raise
-
-    def delete_all_school_events(self, description_pattern="[ESCOLA] [HORARIO_ESCOLAR]"):
+    
+    def delete_all_school_events(self, class_id: str = None) -> int:
         """
-        Deleta todos os eventos escolares do Google Calendar que contenham o padrão na descrição
+        Deleta todas as séries de eventos escolares criadas pelo gerador (opcionalmente só de uma turma)
         """
-        events_result = self.service.events().list(
-            calendarId='primary',
-            q=description_pattern,
-            singleEvents=True
-        ).execute()
-        events = events_result.get('items', [])
+        if not self.service:
+            self.authenticate()
+        
+        # Consulta só os eventos "pais": apagar a série remove todas as instâncias
+        events = self.list_school_events(class_id=class_id)
+        requests = [
+            self._events().delete(calendarId=self.calendar_id, eventId=event['id'])
+            for event in events
+        ]
         deleted_count = 0
-        for event in events:
-            try:
-                self.service.events().delete(calendarId='primary', eventId=event['id']).execute()
-                deleted_count += 1
-                logger.info(f"Evento deletado: {event.get('summary', '')}")
-            except Exception as e:
-                logger.error(f"Erro ao deletar evento: {e}")
+        for event, (_, error) in zip(events, self._execute_batch('delete', requests)):
+            if error is not None:
+                logger.error(f"Erro ao deletar evento: {error}")
+                continue
+            deleted_count += 1
+            log_event(logger, f"Evento deletado: {event.get('summary', '')}")
         logger.info(f"Total de eventos deletados: {deleted_count}")
         return deleted_count
 
@@ -221,19 +333,19 @@ class GoogleCalendarManager:
         page_token = None
         # Primeiro, deleta todas as instâncias futuras
         while True:
-            events_result = self.service.events().list(
+            events_result = self._execute('list', self._events().list(
                 calendarId='primary',
                 timeMin=today.isoformat(),
                 singleEvents=True,  # pega todas as instâncias futuras
                 maxResults=1000,
                 pageToken=page_token
-            ).execute()
+            ))
             events = events_result.get('items', [])
             for event in events:
                 try:
-                    self.service.events().delete(calendarId='primary', eventId=event['id']).execute()
+                    self._execute('delete', self._events().delete(calendarId='primary', eventId=event['id']))
                     deleted_count += 1
-                    logger.info(f"Evento deletado: {event.get('summary', '')}")
+                    log_event(logger, f"Evento deletado: {event.get('summary', '')}")
                 except Exception as e:
                     logger.error(f"Erro ao deletar evento: {e}")
             page_token = events_result.get('nextPageToken')
@@ -242,20 +354,20 @@ class GoogleCalendarManager:
         # Agora, deleta os eventos "pais" recorrentes futuros
         page_token = None
         while True:
-            events_result = self.service.events().list(
+            events_result = self._execute('list', self._events().list(
                 calendarId='primary',
                 timeMin=today.isoformat(),
                 singleEvents=False,  # pega eventos recorrentes "pais"
                 maxResults=1000,
                 pageToken=page_token
-            ).execute()
+            ))
             events = events_result.get('items', [])
             for event in events:
                 if 'recurrence' in event:
                     try:
-                        self.service.events().delete(calendarId='primary', eventId=event['id']).execute()
+                        self._execute('delete', self._events().delete(calendarId='primary', eventId=event['id']))
                         deleted_count += 1
-                        logger.info(f"Evento recorrente deletado: {event.get('summary', '')}")
+                        log_event(logger, f"Evento recorrente deletado: {event.get('summary', '')}")
                     except Exception as e:
                         logger.error(f"Erro ao deletar evento recorrente: {e}")
             page_token = events_result.get('nextPageToken')
@@ -264,23 +376,27 @@ class GoogleCalendarManager:
         logger.info(f"Total de eventos deletados: {deleted_count}")
         return deleted_count
 
-    def get_all_events(self):
+    def get_all_events(self, use_sync: bool = True):
         """
         Retorna todos os eventos futuros do calendário principal (a partir de hoje 00:00 UTC)
+        
+        Com use_sync, usa o espelho local atualizado por sync tokens em vez de listar tudo de novo
         """
         if not self.service:
             self.authenticate()
         today = datetime.combine(datetime.now(timezone.utc).date(), time(0, 0), tzinfo=timezone.utc)
+        if use_sync:
+            return self.get_events_between(today)
         events = []
         page_token = None
         while True:
-            events_result = self.service.events().list(
+            events_result = self._execute('list', self._events().list(
                 calendarId='primary',
                 timeMin=today.isoformat(),
                 singleEvents=True,
                 maxResults=1000,
                 pageToken=page_token
-            ).execute()
+            ))
             items = events_result.get('items', [])
             events.extend(items)
             page_token = events_result.get('nextPageToken')
@@ -288,6 +404,119 @@ class GoogleCalendarManager:
                 break
         return events
 
+    def get_events_between(self, start: datetime, end: datetime = None) -> List[Dict]:
+        """
+        Retorna do espelho local as instâncias que começam entre start e end
+        """
+        mirror = self.sync_events()
+        events = []
+        for event in mirror.values():
+            event_start = self._event_start(event)
+            if event_start is None or event_start < start:
+                continue
+            if end is not None and event_start >= end:
+                continue
+            events.append(event)
+        events.sort(key=self._event_start)
+        return events
+
+    def sync_events(self, calendar_id: str = None) -> Dict[str, Dict]:
+        """
+        Atualiza o espelho local do calendário buscando só as mudanças desde o último nextSyncToken
+
+        O arquivo de estado só é regravado quando chegou alguma alteração ou o token mudou.
+        """
+        if not self.service:
+            self.authenticate()
+        
+        calendar_id = calendar_id or self.calendar_id
+        state = self._load_sync_state().setdefault(calendar_id, {"sync_token": None, "events": {}})
+        mirror = state["events"]
+        previous_token = state["sync_token"]
+        
+        params = {'calendarId': calendar_id, 'singleEvents': True, 'maxResults': 2500}
+        if previous_token:
+            params['syncToken'] = previous_token
+        else:
+            mirror.clear()
+        
+        changed = 0
+        page_token = None
+        try:
+            while True:
+                events_result = self._execute('list', self._events().list(pageToken=page_token, **params))
+                for event in events_result.get('items', []):
+                    changed += 1
+                    if event.get('status') == 'cancelled':
+                        mirror.pop(event['id'], None)
+                    else:
+                        mirror[event['id']] = event
+                page_token = events_result.get('nextPageToken')
+                if not page_token:
+                    state["sync_token"] = events_result.get('nextSyncToken')
+                    break
+        except Exception as e:
+            # 410 Gone: o token expirou e é preciso refazer a sincronização completa
+            if state["sync_token"] and getattr(getattr(e, 'resp', None), 'status', None) == 410:
+                logger.warning("Sync token expirado, refazendo sincronização completa")
+                state["sync_token"] = None
+                return self.sync_events(calendar_id)
+            logger.error(f"Erro ao sincronizar eventos: {e}")
+            raise
+        
+        if changed or state["sync_token"] != previous_token:
+            self._save_sync_state()
+        logger.info(f"Sincronização concluída: {changed} alterações, {len(mirror)} eventos no espelho")
+        return mirror
+
+    def delete_event(self, event_id: str, calendar_id: str = None):
+        """
+        Deleta um evento e o remove do espelho local
+        """
+        if not self.service:
+            self.authenticate()
+        calendar_id = calendar_id or self.calendar_id
+        self._execute('delete', self._events().delete(calendarId=calendar_id, eventId=event_id))
+        self._load_sync_state().get(calendar_id, {}).get("events", {}).pop(event_id, None)
+
+    def _load_sync_state(self) -> Dict:
+        """
+        Carrega os sync tokens e o espelho local de eventos
+        """
+        if self._sync_state is None:
+            self._sync_state = {}
+            if os.path.exists(self.sync_state_file):
+                try:
+                    with open(self.sync_state_file, 'r', encoding='utf-8') as f:
+                        self._sync_state = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Erro ao carregar estado de sincronização: {e}")
+        return self._sync_state
+
+    def _save_sync_state(self):
+        """
+        Salva os sync tokens e o espelho local de eventos
+        """
+        try:
+            with open(self.sync_state_file, 'w', encoding='utf-8') as f:
+                json.dump(self._sync_state, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"Erro ao salvar estado de sincronização: {e}")
+
+    @staticmethod
+    def _event_start(event: Dict) -> Optional[datetime]:
+        """
+        Retorna o início do evento como datetime com fuso (eventos de dia inteiro em UTC)
+        """
+        start = event.get('start', {})
+        value = start.get('dateTime') or start.get('date')
+        if not value:
+            return None
+        event_start = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if event_start.tzinfo is None:
+            event_start = event_start.replace(tzinfo=timezone.utc)
+        return event_start
+
     def create_weekly_event(self, materia: str, start_datetime: datetime, end_datetime: datetime, weekday_num: int, end_date: str) -> str:
         """
         Cria um evento semanal no Google Calendar para a matéria especificada
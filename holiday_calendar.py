@@ -0,0 +1,131 @@
+import bisect
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Arquivo de feriados carregado por padrão, se existir
+HOLIDAYS_FILE = "feriados.txt"
+
+# Períodos a partir deste tamanho (em dias) são recessos: a recorrência é dividida em vez de usar EXDATE
+RECESS_MIN_DAYS = 7
+
+
+def _parse_date(value: str) -> date:
+    value = value.strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {value}")
+
+
+class TermIndex:
+    """
+    Índice pré-calculado dos feriados de um período letivo
+
+    Guarda os trechos de aula (o período sem os recessos) e, para cada dia da semana,
+    a lista ordenada de feriados, consultada por bisect.
+    """
+
+    __slots__ = ("start", "end", "segments", "_by_weekday")
+
+    def __init__(self, start: date, end: date, holidays: List[date], recesses: List[Tuple[date, date]]):
+        self.start = start
+        self.end = end
+        self.segments = self._split(start, end, recesses)
+        self._by_weekday: List[List[date]] = [[] for _ in range(7)]
+        for day in holidays:
+            if start <= day <= end:
+                self._by_weekday[day.weekday()].append(day)
+
+    @staticmethod
+    def _split(start: date, end: date, recesses: List[Tuple[date, date]]) -> List[Tuple[date, date]]:
+        """
+        Remove os recessos do período, truncando ou dividindo-o em trechos
+        """
+        segments = []
+        current = start
+        for recess_start, recess_end in recesses:
+            if recess_end < current or recess_start > end:
+                continue
+            if recess_start > current:
+                segments.append((current, recess_start - timedelta(days=1)))
+            current = max(current, recess_end + timedelta(days=1))
+        if current <= end:
+            segments.append((current, end))
+        return segments
+
+    def exdates(self, weekday: int, start: date, end: date) -> List[date]:
+        """
+        Feriados que caem no dia da semana informado, entre start e end
+        """
+        days = self._by_weekday[weekday]
+        return days[bisect.bisect_left(days, start):bisect.bisect_right(days, end)]
+
+
+class HolidayCalendar:
+    """
+    Feriados e recessos aplicados aos eventos recorrentes (EXDATE e divisão da RRULE)
+
+    Formato do arquivo, uma entrada por linha (";" ou "," separa a descrição opcional):
+        2025-04-18;Sexta-feira Santa
+        14/07/2025..25/07/2025;Recesso de julho
+    """
+
+    def __init__(self, holidays: Iterable[date] = (), ranges: Iterable[Tuple[date, date]] = (),
+                 recess_min_days: int = RECESS_MIN_DAYS):
+        days = set(holidays)
+        recesses = []
+        for range_start, range_end in ranges:
+            if (range_end - range_start).days + 1 >= recess_min_days:
+                recesses.append((range_start, range_end))
+            else:
+                # Períodos curtos (ex.: emenda de feriado) viram EXDATEs
+                days.update(range_start + timedelta(days=i) for i in range((range_end - range_start).days + 1))
+        self.holidays = sorted(days)
+        self.recesses = sorted(recesses)
+        self._terms: Dict[Tuple[date, date], TermIndex] = {}
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str], recess_min_days: int = RECESS_MIN_DAYS) -> "HolidayCalendar":
+        holidays = []
+        ranges = []
+        for number, line in enumerate(lines, start=1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            value = line.replace(",", ";").split(";", 1)[0]
+            try:
+                if ".." in value:
+                    range_start, range_end = (_parse_date(part) for part in value.split("..", 1))
+                    if range_end < range_start:
+                        raise ValueError(f"Período invertido: {value}")
+                    ranges.append((range_start, range_end))
+                else:
+                    holidays.append(_parse_date(value))
+            except ValueError as e:
+                logger.warning(f"Linha {number} do arquivo de feriados ignorada: {e}")
+        return cls(holidays, ranges, recess_min_days)
+
+    @classmethod
+    def from_file(cls, path: str, recess_min_days: int = RECESS_MIN_DAYS) -> "HolidayCalendar":
+        with open(path, "r", encoding="utf-8-sig") as f:
+            calendar = cls.from_lines(f, recess_min_days)
+        logger.info(f"{len(calendar.holidays)} feriados e {len(calendar.recesses)} recessos carregados de {path}")
+        return calendar
+
+    def term(self, start: date, end: date) -> TermIndex:
+        """
+        Índice dos feriados do período (calculado uma vez por período)
+        """
+        key = (start, end)
+        index = self._terms.get(key)
+        if index is None:
+            index = self._terms[key] = TermIndex(start, end, self.holidays, self.recesses)
+        return index
+
+    def __bool__(self) -> bool:
+        return bool(self.holidays or self.recesses)
@@ -0,0 +1,221 @@
+import re
+import csv
+import argparse
+import logging
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+from parser import ScheduleParser
+from schedule import Schedule, DIAS, day_index
+
+logger = logging.getLogger(__name__)
+
+# Nomes de coluna aceitos no cabeçalho (comparados sem acentos e em minúsculas)
+COLUNAS_TURMA = ("turma", "classe", "class", "class_id")
+COLUNAS_DIA = ("dia", "dia_semana", "dia da semana", "day")
+COLUNAS_AULA = ("aula", "slot", "horario", "periodo")
+COLUNAS_MATERIA = ("materia", "disciplina", "subject")
+
+# Separadores aceitos em arquivos CSV (o usado é o que mais aparece no cabeçalho)
+DELIMITADORES = ",;\t"
+
+# Dias escritos como número (2ª = segunda ... 6ª = sexta)
+_DIA_NUMERO = {str(n): DIAS[n - 2] for n in range(2, 7)}
+
+_ACENTOS = str.maketrans("áàâãéêíóôõúç", "aaaaeeiooouc")
+
+
+def _normalize_header(value) -> str:
+    return str(value or "").strip().lower().translate(_ACENTOS)
+
+
+class TableLayout:
+    """
+    Posição das colunas de uma planilha de horários
+
+    Formato longo: turma, dia, aula, matéria (uma aula por linha).
+    Formato largo: turma, dia e uma coluna por aula (um dia por linha).
+    """
+
+    def __init__(self, header: Sequence):
+        names = [_normalize_header(h) for h in header]
+        self.turma = self._find(names, COLUNAS_TURMA)
+        self.dia = self._find(names, COLUNAS_DIA)
+        if self.turma is None or self.dia is None:
+            raise ValueError(f"Cabeçalho sem colunas de turma e dia: {list(header)}")
+        self.aula = self._find(names, COLUNAS_AULA)
+        self.materia = self._find(names, COLUNAS_MATERIA)
+        self.long_format = self.aula is not None and self.materia is not None
+        # Colunas que toda linha precisa ter
+        self.required = max(
+            (self.turma, self.dia, self.aula, self.materia) if self.long_format else (self.turma, self.dia)
+        ) + 1
+        # No formato largo, as colunas restantes são as aulas, na ordem
+        self.slot_columns = [
+            i for i in range(len(names)) if i not in (self.turma, self.dia)
+        ] if not self.long_format else []
+
+    @staticmethod
+    def _find(names: List[str], candidates: Sequence[str]) -> Optional[int]:
+        for i, name in enumerate(names):
+            if name in candidates:
+                return i
+        return None
+
+
+def iter_rows(path: str, delimiter: Optional[str] = None) -> Iterator[List[str]]:
+    """
+    Lê as linhas de um CSV ou XLSX uma a uma, sem carregar o arquivo inteiro
+
+    Sem delimiter, o separador do CSV é detectado só pelo cabeçalho, pois as linhas
+    de dados podem ter menos colunas.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportError("Para ler planilhas .xlsx instale o openpyxl: pip install openpyxl")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield ["" if value is None else str(value) for value in row]
+        finally:
+            workbook.close()
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            if delimiter is None:
+                header = f.readline()
+                f.seek(0)
+                delimiter = max(DELIMITADORES, key=header.count)
+            yield from csv.reader(f, delimiter=delimiter)
+
+
+def parse_day(value: str, parser: ScheduleParser) -> Optional[int]:
+    """
+    Converte "Segunda", "segunda-feira", "SEG", "2ª"... no índice do dia na grade
+    """
+    value = value.strip().lower()
+    if not value:
+        return None
+    digits = re.match(r"(\d)", value)
+    if digits and digits.group(1) in _DIA_NUMERO:
+        return day_index(_DIA_NUMERO[digits.group(1)])
+    for dia, aliases in parser.dias_semana.items():
+        if any(value.startswith(alias) for alias in aliases):
+            return day_index(dia)
+    return None
+
+
+def parse_slot(value: str, parser: ScheduleParser) -> Optional[int]:
+    """
+    Converte "1", "1ª aula" ou o horário de início ("07:30") no índice da aula (a partir de 0)
+    """
+    value = value.strip()
+    starts = [slot.split("-")[0] for slot in parser.get_time_slots()]
+    time_match = re.match(r"(\d{1,2}):(\d{2})", value)
+    if time_match:
+        start = f"{int(time_match.group(1)):02d}:{time_match.group(2)}"
+        return starts.index(start) if start in starts else None
+    number = re.match(r"(\d+)", value)
+    if number:
+        return int(number.group(1)) - 1
+    return None
+
+
+def iter_schedules(path: str, parser: Optional[ScheduleParser] = None,
+                   delimiter: Optional[str] = None) -> Iterator[Schedule]:
+    """
+    Lê uma planilha de horários de toda a escola e gera um Schedule por turma
+
+    As linhas de uma turma devem vir juntas (como nas exportações das secretarias);
+    cada turma é emitida assim que a próxima começa, então a memória não cresce com o arquivo.
+    """
+    parser = parser or ScheduleParser()
+    rows = iter_rows(path, delimiter)
+    header = next(rows, None)
+    if header is None:
+        return
+    layout = TableLayout(header)
+
+    current: Optional[Schedule] = None
+    emitted = set()
+    for line_number, row in enumerate(rows, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) < layout.required:
+            logger.warning(f"Linha {line_number}: {len(row)} colunas, esperadas ao menos {layout.required}; linha ignorada")
+            continue
+        class_id = row[layout.turma].strip()
+        if current is None or class_id != current.class_id:
+            if current is not None:
+                yield current
+            if class_id in emitted:
+                logger.warning(f"Turma {class_id} aparece de novo na linha {line_number}; as linhas de cada turma devem vir juntas")
+            emitted.add(class_id)
+            current = Schedule(class_id=class_id, slots_per_day=parser.aulas_por_dia)
+
+        weekday = parse_day(row[layout.dia], parser)
+        if weekday is None:
+            logger.warning(f"Linha {line_number}: dia não reconhecido '{row[layout.dia]}'")
+            continue
+
+        if layout.long_format:
+            cells = [(parse_slot(row[layout.aula], parser), row[layout.materia])]
+        else:
+            cells = [(slot, row[column]) for slot, column in enumerate(layout.slot_columns) if column < len(row)]
+
+        for slot, cell in cells:
+            if slot is None or not 0 <= slot < parser.aulas_por_dia:
+                logger.warning(f"Linha {line_number}: aula fora da grade")
+                continue
+            current.set(weekday, slot, parser.normalize_table_cell(cell))
+
+    if current is not None:
+        yield current
+
+
+def iter_chunks(path: str, chunk_size: int = 100, parser: Optional[ScheduleParser] = None,
+                delimiter: Optional[str] = None) -> Iterator[List[Schedule]]:
+    """
+    Agrupa os horários lidos em blocos de até chunk_size turmas
+    """
+    schedules = iter_schedules(path, parser, delimiter)
+    while True:
+        chunk = list(islice(schedules, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def main():
+    from main import CalendarGenerator
+
+    arg_parser = argparse.ArgumentParser(description="Importa os horários de todas as turmas de uma planilha CSV/XLSX")
+    arg_parser.add_argument("arquivo", help="planilha .csv ou .xlsx")
+    arg_parser.add_argument("data_final", help="data final dos eventos (AAAA-MM-DD)")
+    arg_parser.add_argument("--google-calendar", action="store_true", help="cria os eventos no Google Calendar")
+    arg_parser.add_argument("--chunk-size", type=int, default=100, help="turmas processadas por bloco")
+    arg_parser.add_argument("--delimiter", help="separador do CSV (padrão: detectado pelo cabeçalho)")
+    arg_parser.add_argument("--no-merge", action="store_true", help="não une aulas seguidas da mesma matéria")
+    arg_parser.add_argument("--sinks", help="saídas separadas por vírgula (ics, google, json, csv, feed), geradas em paralelo")
+    args = arg_parser.parse_args()
+
+    sinks = args.sinks.split(",") if args.sinks else None
+    generator = CalendarGenerator(use_google_calendar=args.google_calendar, merge_slots=not args.no_merge, sinks=sinks)
+
+    total = 0
+    try:
+        for class_id, result in generator.process_table(args.arquivo, args.data_final, chunk_size=args.chunk_size,
+                                                        delimiter=args.delimiter):
+            total += 1
+            print(f"{class_id}: {result}")
+    finally:
+        print(f"{total} turmas processadas")
+        if sinks and generator.last_report is not None:
+            print(generator.last_report.summary())
+
+
+if __name__ == "__main__":
+    main()
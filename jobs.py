@@ -0,0 +1,202 @@
+import os
+import json
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from google_calendar_manager import DeletedEventIdError
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+JOBS_STATE_FILE = "calendar_jobs.json"
+
+# Progresso salvo a cada N eventos criados (e sempre ao terminar ou falhar)
+CHECKPOINT_EVERY = 20
+
+# Jobs concluídos (ou substituídos) há mais tempo que isso saem do arquivo de checkpoint
+JOB_RETENTION_DAYS = 30
+
+# Gerações de IDs tentadas quando os IDs do job pertencem a eventos apagados
+MAX_GENERATION_RETRIES = 5
+
+
+def event_id_for(job_key: str, class_id: Optional[str], weekday: str, slot: int, segment: str = "",
+                 generation: int = 0) -> str:
+    """
+    ID determinístico do evento no formato aceito pela API (base32hex minúsculo)
+
+    A chave do job entra no hash: o mesmo horário gera os mesmos IDs ao ser retomado,
+    e um horário alterado gera IDs novos. O trecho da recorrência é identificado pela data
+    em que termina, que não muda de um dia para o outro. A geração muda quando os eventos
+    do job são apagados (a API não aceita reusar o ID de um evento apagado).
+    """
+    job = f"{job_key}.{generation}" if generation else job_key
+    source = f"{job}|{class_id or ''}|{weekday}|{slot}|{segment}".encode("utf-8")
+    return base64.b32hexencode(hashlib.sha1(source).digest()).decode("ascii").rstrip("=").lower()
+
+
+class BulkJobRunner:
+    """
+    Cria os eventos de uma turma no Google Calendar de forma retomável e idempotente
+
+    Cada evento recebe um ID determinístico e o progresso fica salvo em um arquivo JSON.
+    Se a execução falhar no meio (quota, rede), rodar de novo pula o que já foi feito;
+    um 409 (ID já existente) conta como evento criado.
+
+    Um job concluído só é pulado se os eventos dele ainda estiverem no calendário. Se foram
+    apagados (por outro job da mesma turma ou à mão), o job recomeça em uma nova geração de IDs.
+    """
+
+    def __init__(self, manager, state_file: str = JOBS_STATE_FILE, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.manager = manager
+        self.state_file = state_file
+        self.checkpoint_every = checkpoint_every
+        self._lock = threading.Lock()
+        self._state: Optional[Dict] = None
+
+    def run(self, job_key: str, events: List[Dict], class_id: Optional[str] = None) -> Dict:
+        """
+        Executa (ou retoma) o job e devolve o resumo {"created", "skipped"}
+        """
+        job = self._job(job_key, class_id)
+        if job["status"] == "done":
+            if self._still_in_calendar(job, class_id):
+                metrics.inc("job_events_skipped", len(events))
+                logger.info(f"Job {job_key} já concluído, nada a fazer")
+                return {"created": 0, "skipped": len(events)}
+            logger.info(f"Eventos do job {job_key} não estão mais no calendário; recriando")
+            job = self._restart(job_key, class_id)
+        for attempt in range(MAX_GENERATION_RETRIES):
+            try:
+                return self._run(job_key, job, events, class_id)
+            except DeletedEventIdError as e:
+                # IDs de eventos apagados (checkpoint perdido ou anterior à exclusão): a geração seguinte evita o conflito
+                logger.warning(f"Job {job_key}: {e}; recomeçando com novos IDs")
+                job = self._restart(job_key, class_id)
+        return self._run(job_key, job, events, class_id)
+
+    def _run(self, job_key: str, job: Dict, events: List[Dict], class_id: Optional[str]) -> Dict:
+        summary = {"created": 0, "skipped": 0}
+        if job["done"]:
+            logger.info(f"Retomando job {job_key}: {len(job['done'])} de {len(events)} eventos já criados")
+
+        # Os eventos antigos da turma são removidos uma única vez, antes do primeiro evento do job
+        if class_id is not None and not job["replaced"]:
+            self.manager.delete_all_school_events(class_id=class_id)
+            job["replaced"] = True
+            # Os jobs anteriores da turma tiveram os eventos apagados: rodá-los de novo recria tudo
+            for other_key, other in self._load().items():
+                if other_key != job_key and other["class_id"] == class_id and other["status"] != "stale":
+                    other["status"] = "stale"
+                    other["updated"] = datetime.now().isoformat()
+            self._save()
+
+        done = set(job["done"])
+        generation = job.get("generation", 0)
+        pending_checkpoint = 0
+        try:
+            for event in events:
+                segment = str(event.get("segment_end", event.get("segment", 0)))
+                event_id = event_id_for(job_key, class_id, event["dia_semana"], event["slot"], segment, generation)
+                if event_id in done:
+                    summary["skipped"] += 1
+                    continue
+                # Um 409 (evento criado por uma execução que caiu antes do checkpoint) também conta como feito
+                self.manager.create_event(
+                    title=event["materia"],
+                    start_time=event["start"],
+                    end_time=event["end"],
+                    dia_semana=event["dia_semana"],
+                    recurrence=event["recurrence"],
+                    class_id=class_id,
+                    slot=event["slot"],
+                    event_id=event_id
+                )
+                summary["created"] += 1
+                done.add(event_id)
+                job["done"].append(event_id)
+                pending_checkpoint += 1
+                if pending_checkpoint >= self.checkpoint_every:
+                    self._save()
+                    pending_checkpoint = 0
+            job["status"] = "done"
+        finally:
+            job["updated"] = datetime.now().isoformat()
+            self._save()
+
+        metrics.inc("job_events_created", summary["created"])
+        metrics.inc("job_events_skipped", summary["skipped"])
+        logger.info(f"Job {job_key} concluído: {summary['created']} criados, {summary['skipped']} já feitos")
+        return summary
+
+    def status(self, job_key: str) -> Optional[Dict]:
+        return self._load().get(job_key)
+
+    def _job(self, job_key: str, class_id: Optional[str]) -> Dict:
+        job = self._load().get(job_key)
+        if job is None or job["status"] == "stale":
+            job = self._restart(job_key, class_id)
+        return job
+
+    def _restart(self, job_key: str, class_id: Optional[str]) -> Dict:
+        """
+        Começa o job do zero; se ele já existia, com a geração seguinte de IDs
+        """
+        state = self._load()
+        previous = state.get(job_key)
+        job = state[job_key] = {
+            "class_id": class_id,
+            "status": "running",
+            "generation": previous.get("generation", 0) + 1 if previous else 0,
+            "replaced": False,
+            "done": [],
+            "updated": datetime.now().isoformat(),
+        }
+        return job
+
+    def _still_in_calendar(self, job: Dict, class_id: Optional[str]) -> bool:
+        """
+        Confere com uma listagem se os eventos criados pelo job continuam no calendário
+        """
+        existing = {event["id"] for event in self.manager.list_school_events(class_id=class_id)}
+        return existing.issuperset(job["done"])
+
+    def _load(self) -> Dict:
+        """
+        Carrega os checkpoints salvos (uma vez por instância)
+        """
+        if self._state is None:
+            self._state = {}
+            if os.path.exists(self.state_file):
+                try:
+                    with open(self.state_file, 'r', encoding='utf-8') as f:
+                        self._state = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Erro ao carregar checkpoints de jobs: {e}")
+        return self._state
+
+    def _save(self):
+        """
+        Grava os checkpoints de forma atômica, descartando jobs concluídos antigos
+        """
+        with self._lock:
+            state = self._load()
+            cutoff = (datetime.now() - timedelta(days=JOB_RETENTION_DAYS)).isoformat()
+            for job_key in [k for k, job in state.items() if job["status"] in ("done", "stale") and job["updated"] < cutoff]:
+                del state[job_key]
+
+            directory = os.path.dirname(os.path.abspath(self.state_file))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(temp_path, self.state_file)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
@@ -0,0 +1,195 @@
+import re
+import logging
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from adaptive_ocr import OcrWord
+from schedule import Schedule, DIAS, day_index
+
+logger = logging.getLogger(__name__)
+
+# Distância horizontal (em alturas de linha) acima da qual duas palavras da mesma linha são células diferentes
+CELL_GAP = 1.2
+
+# Horários ("07:30", "7h30", "07:30-08:15") e rótulos de aula ("1ª aula", "2º") não são matérias
+_TIME_OR_LABEL = re.compile(r'^(\d{1,2}\s*[:h]\s*\d{2}.*|\d+\s*[ªaº°o]?\.?(\s*aula)?|aula\s*\d+|horário|horario)$', re.IGNORECASE)
+
+_ACENTOS = str.maketrans("áàâãéêíóôõúç", "aaaaeeiooouc")
+
+
+class LayoutCell(NamedTuple):
+    """
+    Célula da grade reconstruída: dia, aula (a partir de 0), texto lido e confiança do OCR
+    """
+    weekday: int
+    slot: int
+    text: str
+    conf: float
+
+
+class LayoutResult(NamedTuple):
+    """
+    Horário reconstruído das caixas do OCR e a orientação detectada ("colunas" ou "linhas")
+    """
+    schedule: Schedule
+    orientation: str
+    cells: List[LayoutCell]
+
+
+def interval_clusters(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Agrupa intervalos que se sobrepõem (em cadeia) e devolve o rótulo de cada um, em ordem crescente de posição
+
+    Uma única ordenação e uma varredura vetorizada: um novo grupo começa quando o intervalo
+    começa depois do maior fim visto até ali.
+    """
+    if len(starts) == 0:
+        return np.zeros(0, dtype=int)
+    order = np.argsort(starts, kind="stable")
+    sorted_starts = starts[order]
+    running_end = np.maximum.accumulate(ends[order])
+    new_group = np.empty(len(order), dtype=bool)
+    new_group[0] = False
+    new_group[1:] = sorted_starts[1:] > running_end[:-1]
+    labels = np.empty(len(order), dtype=int)
+    labels[order] = np.cumsum(new_group)
+    return labels
+
+
+class LayoutParser:
+    """
+    Reconstrói a grade dias x aulas a partir das caixas das palavras de uma única passada de OCR
+
+    Funciona tanto com um dia por coluna (o formato impresso mais comum, que o tesseract lê
+    linha a linha) quanto com um dia por linha: a orientação vem da posição dos nomes dos dias.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self._day_aliases = [
+            (day_index(dia), [alias.translate(_ACENTOS) for alias in aliases])
+            for dia, aliases in parser.dias_semana.items()
+        ]
+
+    def _match_day(self, text: str) -> Optional[int]:
+        word = re.sub(r'[^a-z]', '', text.lower().translate(_ACENTOS).split('-')[0])
+        if not word:
+            return None
+        for weekday, aliases in self._day_aliases:
+            if word in aliases or (len(word) >= 5 and any(alias.startswith(word) or word.startswith(alias) for alias in aliases if len(alias) >= 5)):
+                return weekday
+        return None
+
+    @staticmethod
+    def _cells_from_words(words: Sequence[OcrWord]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Junta as palavras em células: mesma linha visual e próximas na horizontal
+
+        Retorna os textos, as caixas (esquerda, topo, direita, base) e a confiança média de cada célula.
+        """
+        boxes = np.array([(w.left, w.top, w.left + w.width, w.top + w.height) for w in words], dtype=float)
+        confs = np.array([w.conf for w in words], dtype=float)
+        line_height = float(np.median(boxes[:, 3] - boxes[:, 1]))
+
+        # Linhas visuais: caixas que se sobrepõem na vertical (reduzidas um pouco para não emendar linhas vizinhas)
+        shrink = (boxes[:, 3] - boxes[:, 1]) * 0.25
+        rows = interval_clusters(boxes[:, 1] + shrink, boxes[:, 3] - shrink)
+
+        # Dentro da linha, em ordem de x, um espaço maior que CELL_GAP alturas separa células
+        order = np.lexsort((boxes[:, 0], rows))
+        gaps = boxes[order[1:], 0] - boxes[order[:-1], 2]
+        new_cell = np.concatenate(([True], (rows[order[1:]] != rows[order[:-1]]) | (gaps > CELL_GAP * line_height)))
+        cell_ids = np.cumsum(new_cell) - 1
+
+        count = int(cell_ids[-1]) + 1
+        cell_boxes = np.empty((count, 4))
+        cell_boxes[:, :2] = np.inf
+        cell_boxes[:, 2:] = -np.inf
+        np.minimum.at(cell_boxes[:, 0], cell_ids, boxes[order, 0])
+        np.minimum.at(cell_boxes[:, 1], cell_ids, boxes[order, 1])
+        np.maximum.at(cell_boxes[:, 2], cell_ids, boxes[order, 2])
+        np.maximum.at(cell_boxes[:, 3], cell_ids, boxes[order, 3])
+        cell_confs = np.bincount(cell_ids, weights=confs[order]) / np.bincount(cell_ids)
+
+        texts = [[] for _ in range(count)]
+        for cell_id, word_index in zip(cell_ids, order):
+            texts[cell_id].append(words[word_index].text)
+        return [" ".join(t) for t in texts], cell_boxes, cell_confs
+
+    def parse(self, words: Sequence[OcrWord], class_id: Optional[str] = None) -> Optional[LayoutResult]:
+        """
+        Monta o horário a partir das palavras do OCR; None se não achar ao menos dois dias no cabeçalho
+        """
+        if not words:
+            return None
+        texts, boxes, confs = self._cells_from_words(words)
+
+        days = np.array([-1 if (d := self._match_day(t)) is None else d for t in texts])
+        header = np.flatnonzero(days >= 0)
+        if len(np.unique(days[header])) < 2:
+            logger.info("Layout sem cabeçalho de dias reconhecível")
+            return None
+
+        centers = np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2))
+        # Dias espalhados na horizontal: um dia por coluna; na vertical: um dia por linha
+        spread = np.ptp(centers[header], axis=0)
+        day_axis = 0 if spread[0] >= spread[1] else 1
+        slot_axis = 1 - day_axis
+        orientation = "colunas" if day_axis == 0 else "linhas"
+
+        # Uma posição por dia (se o nome aparecer duas vezes, vale a primeira)
+        _, first = np.unique(days[header], return_index=True)
+        header = header[first]
+        day_positions = centers[header, day_axis]
+        spacing = np.min(np.diff(np.sort(day_positions)))
+        header_end = boxes[header, slot_axis + 2].max()
+
+        is_label = np.array([bool(_TIME_OR_LABEL.match(t.strip())) for t in texts])
+        candidates = np.flatnonzero((days < 0) & ~is_label & (centers[:, slot_axis] > header_end))
+        if len(candidates) == 0:
+            return LayoutResult(Schedule(class_id=class_id, slots_per_day=self.parser.aulas_por_dia), orientation, [])
+
+        # Cada célula vai para o dia mais próximo no eixo dos dias, se estiver a menos de meia coluna dele
+        distance = np.abs(centers[candidates, day_axis][:, None] - day_positions[None, :])
+        nearest = np.argmin(distance, axis=1)
+        inside = distance[np.arange(len(candidates)), nearest] <= spacing * 0.6
+        candidates, nearest = candidates[inside], nearest[inside]
+
+        # Aulas: células que se sobrepõem no outro eixo
+        slot_groups = interval_clusters(boxes[candidates, slot_axis], boxes[candidates, slot_axis + 2])
+
+        subjects = [self.parser.normalize_cell(texts[i]) for i in candidates]
+        # Linhas (ou colunas) só de recreio não contam como aula
+        recess_groups = {
+            group for group in np.unique(slot_groups)
+            if all(subjects[k] == "Recreio" for k in np.flatnonzero(slot_groups == group))
+        }
+        kept_groups = [group for group in np.unique(slot_groups) if group not in recess_groups]
+        slot_of_group = {group: slot for slot, group in enumerate(kept_groups)}
+        if len(kept_groups) > self.parser.aulas_por_dia:
+            logger.warning(f"Layout com {len(kept_groups)} aulas por dia; só as {self.parser.aulas_por_dia} primeiras foram usadas")
+
+        schedule = Schedule(class_id=class_id, slots_per_day=self.parser.aulas_por_dia)
+        cells = []
+        for k, cell_index in enumerate(candidates):
+            slot = slot_of_group.get(slot_groups[k])
+            if slot is None or slot >= self.parser.aulas_por_dia:
+                continue
+            weekday = int(days[header[nearest[k]]])
+            schedule.set(weekday, slot, subjects[k])
+            cells.append(LayoutCell(weekday, slot, texts[cell_index], float(confs[cell_index])))
+
+        cells.sort(key=lambda cell: (cell.weekday, cell.slot))
+        logger.info(f"Layout por {orientation}: {len(cells)} células em {len(kept_groups)} aulas")
+        return LayoutResult(schedule, orientation, cells)
+
+
+def schedule_to_text(schedule: Schedule) -> str:
+    """
+    Escreve o horário no formato de texto que parse_schedule_from_text lê (um dia após o outro, uma aula por linha)
+    """
+    lines = ["HORÁRIO"]
+    for dia in DIAS:
+        lines.extend(schedule[dia])
+    return "\n".join(lines)
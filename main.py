@@ -1,11 +1,23 @@
 import os
+import hashlib
+import queue
 import sys
 from datetime import datetime, timedelta, date
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 from ics import Calendar, Event
+from ics.grammar.parse import ContentLine
 from parser import ScheduleParser
+from schedule import Schedule, DIAS
+from ingest import iter_schedules
+from documents import iter_document_schedules, DEFAULT_DPI
+from export_cache import ExportCache, ExportArtifact, safe_class_id, schedule_key
+from holiday_calendar import HolidayCalendar, HOLIDAYS_FILE
 from google_calendar_manager import GoogleCalendarManager
+from jobs import BulkJobRunner
+from sinks import ExportPipeline, ExportReport, SINK_QUEUE_SIZE, make_sinks
+from metrics import metrics, bulk_logging, profile_job
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,146 +28,314 @@ class CalendarGenerator:
     Gerador de calendário a partir de horários escolares
     """
     
-    def __init__(self, use_google_calendar: bool = False, turno: str = "manha"):
+    def __init__(self, use_google_calendar: bool = False, turno: str = "manha", event_log_every: int = 1,
+                 merge_slots: bool = True, merge_max_gap: int = 5, holidays: Optional[HolidayCalendar] = None,
+                 sinks: Optional[List[str]] = None):
         self.parser = ScheduleParser(turno=turno)
         self.output_dir = Path("output")
         self.output_dir.mkdir(exist_ok=True)
+        # Arquivos .ics endereçados pelo conteúdo, com retenção limitada
+        self.export_cache = ExportCache(self.output_dir)
         self.use_google_calendar = use_google_calendar
-        self.google_manager = GoogleCalendarManager() if use_google_calendar else None
+        # Saídas de process_text ("ics", "google", "json", "csv", "feed"), alimentadas por uma única compilação
+        self.sinks = sinks or (["google"] if use_google_calendar else ["ics"])
+        needs_google = use_google_calendar or "google" in self.sinks
+        self.google_manager = GoogleCalendarManager() if needs_google else None
+        # Criação de eventos retomável, com checkpoint em calendar_jobs.json
+        self.job_runner = BulkJobRunner(self.google_manager) if needs_google else None
+        # Relatório por saída da última chamada a process_text
+        self.last_report: Optional[ExportReport] = None
+        # Amostragem dos logs por evento em operações em lote (1 = todos, N = um a cada N, 0 = nenhum)
+        self.event_log_every = event_log_every
+        # Une aulas seguidas da mesma matéria em um único evento (intervalo máximo em minutos)
+        self.merge_slots = merge_slots
+        self.merge_max_gap = merge_max_gap
+        # Feriados e recessos (por padrão, os do arquivo feriados.txt, se existir)
+        if holidays is None:
+            holidays = HolidayCalendar.from_file(HOLIDAYS_FILE) if os.path.exists(HOLIDAYS_FILE) else HolidayCalendar()
+        self.holidays = holidays
     
-    def process_text(self, text: str, end_date: str) -> str:
+    def process_text(self, text: str, end_date: str, class_id: Optional[str] = None) -> str:
         """
-        Processa um texto de horário e gera o arquivo .ics ou eventos no Google Calendar
+        Processa um texto de horário e o envia para as saídas configuradas (.ics, Google Calendar...)
+        
+        Retorna o resultado da primeira saída; o relatório de todas fica em last_report.
         """
         try:
             logger.info(f"Processando texto")
             
-            # Faz o parsing do horário
-            schedule = self.parser.parse_schedule_from_text(text)
-            logger.info(f"Horário extraído: {schedule}")
-            
-            if self.use_google_calendar:
-                # Cria eventos diretamente no Google Calendar
-                self.create_google_calendar_events(schedule, end_date)
-                return "Google Calendar atualizado com sucesso!"
-            else:
-                # Gera arquivo .ics
-                ics_file = self.create_ics_file(schedule, end_date)
-                return ics_file
+            with profile_job("process_text"):
+                # Faz o parsing do horário
+                schedule = self.parser.parse_schedule_from_text(text, class_id=class_id)
+                logger.info(f"Horário extraído: {schedule}")
+                
+                self.last_report = self.export([schedule], end_date)
+                first = self.last_report.stats[self.sinks[0]]
+                if first.errors:
+                    raise RuntimeError(first.last_error)
+                if self.sinks[0] == "google":
+                    return "Google Calendar atualizado com sucesso!"
+                return self.last_report.result(self.sinks[0])
             
         except Exception as e:
             logger.error(f"Erro ao processar texto: {e}")
             raise
+    
+    def process_image(self, image_path: str, end_date: str, class_id: Optional[str] = None) -> str:
+        """
+        Lê a imagem do horário com OCR e a processa como process_text
+        """
+        text = self.parser.extract_text_from_image(image_path)
+        return self.process_text(text, end_date, class_id=class_id)
+    
+    def export(self, schedules: Iterable[Schedule], end_date: str, sinks: Optional[List[str]] = None,
+               feed_store=None) -> ExportReport:
+        """
+        Compila cada horário uma única vez e o envia para todas as saídas, que rodam em paralelo
+        """
+        for _ in self.iter_export(schedules, end_date, sinks, feed_store):
+            pass
+        return self.last_report
 
-    def create_google_calendar_events(self, schedule: dict, end_date: str):
+    def iter_export(self, schedules: Iterable[Schedule], end_date: str, sinks: Optional[List[str]] = None,
+                    feed_store=None, queue_size: int = SINK_QUEUE_SIZE) -> Iterator[Tuple[Optional[str], Optional[str], Optional[str]]]:
         """
-        Cria os eventos no Google Calendar
+        Como export, mas gera (turma, resultado, erro) da primeira saída à medida que cada turma fica pronta
+
+        O relatório de todas as saídas fica em last_report ao fim da geração.
         """
-        if not self.google_manager:
-            raise ValueError("Google Calendar Manager não está inicializado.")
-        
-        self.google_manager.authenticate()
+        sink_list = make_sinks(sinks or self.sinks, self, feed_store=feed_store)
+        completed: "queue.Queue" = queue.Queue()
+        # As threads das saídas herdam a amostragem de logs e terminam dentro do bloco
+        with bulk_logging(self.event_log_every):
+            pipeline = ExportPipeline(sink_list, queue_size, completed=completed)
+            try:
+                for schedule in schedules:
+                    if not isinstance(schedule, Schedule):
+                        schedule = Schedule.from_dict(schedule, slots_per_day=self.parser.aulas_por_dia)
+                    pipeline.submit(schedule, self.compile_events(schedule, end_date), end_date)
+                    yield from self._drain(completed)
+            finally:
+                self.last_report = pipeline.close()
+        yield from self._drain(completed)
+
+    @staticmethod
+    def _drain(completed: "queue.Queue") -> Iterator[Tuple[Optional[str], Optional[str], Optional[str]]]:
+        while True:
+            try:
+                yield completed.get_nowait()
+            except queue.Empty:
+                return
+
+    def _export_results(self, schedules: Iterable[Schedule], end_date: str,
+                        queue_size: int = SINK_QUEUE_SIZE) -> Iterator[Tuple[str, str]]:
+        """
+        Exporta para as saídas configuradas e gera (turma, resultado) da primeira saída
+
+        As turmas com erro não interrompem as demais; no fim, levanta RuntimeError se alguma falhou.
+        """
+        failed = []
+        for class_id, result, error in self.iter_export(schedules, end_date, queue_size=queue_size):
+            if error is not None:
+                failed.append(f"{class_id}: {error}")
+                continue
+            yield class_id, result
+        if failed:
+            raise RuntimeError(f"{len(failed)} turmas com erro na saída {self.sinks[0]} ({failed[0]})")
+
+    def process_table(self, path: str, end_date: str, chunk_size: int = 100,
+                      delimiter: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Processa uma planilha (CSV/XLSX) com os horários de todas as turmas, enviando-os para as saídas configuradas
         
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
-        today = date.today()
-        dias = ["segunda", "terça", "quarta", "quinta", "sexta"]
+        Gera (turma, resultado) à medida que cada turma é exportada; no máximo chunk_size turmas lidas
+        ficam à espera em cada saída.
+        """
+        schedules = iter_schedules(path, self.parser, delimiter)
+        yield from self._export_results(schedules, end_date, queue_size=chunk_size)
+
+    def process_document(self, path: str, end_date: str, dpi: int = DEFAULT_DPI,
+                         workers: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Processa um PDF/TIFF com uma turma por página, com o OCR das páginas em paralelo
         
-        for dia_nome, materias in schedule.items():
-            if dia_nome not in dias:
-                continue
+        Gera (turma, resultado) à medida que cada página fica pronta e é exportada para as saídas configuradas
+        """
+        def schedules():
+            for page in iter_document_schedules(path, dpi=dpi, workers=workers, turno=self.parser.turno):
+                logger.info(f"Página {page.page}: turma {page.schedule.class_id} (confiança {page.confidence:.0f}%)")
+                yield page.schedule
 
-            weekday_num = dias.index(dia_nome)
-            
-            for i, materia in enumerate(materias):
-                if not materia or materia.lower() == "recreio":
-                    continue
-                
-                # Pega os horários da aula
-                time_slots = self.parser.get_time_slots()
-                start_time_str, end_time_str = time_slots[i].split('-')
-                
-                # Encontra a primeira ocorrência do dia da semana a partir de hoje
-                current_day = today
-                days_ahead = weekday_num - today.weekday()
-                if days_ahead < 0:
-                    days_ahead += 7
-                current_day += timedelta(days=days_ahead)
-                
-                start_datetime = datetime.combine(
-                    current_day,
-                    datetime.strptime(start_time_str, "%H:%M").time()
-                )
-                
-                end_datetime = datetime.combine(
-                    current_day,
-                    datetime.strptime(end_time_str, "%H:%M").time()
-                )
-                
-                # Cria o evento com os argumentos corretos
-                self.google_manager.create_event(
-                    title=materia,
-                    start_time=start_datetime,
-                    end_time=end_datetime,
-                    dia_semana=dia_nome,
-                    recurrence=[f"RRULE:FREQ=WEEKLY;UNTIL={end_dt.strftime('%Y%m%d')}T235959Z"]
-                )
+        yield from self._export_results(schedules(), end_date)
     
-    def create_ics_file(self, schedule: dict, end_date: str) -> str:
+    def compile_events(self, schedule: Schedule, end_date: str) -> List[Dict]:
         """
-        Cria um arquivo .ics com os eventos do calendário
+        Converte o horário em eventos semanais, usados tanto no .ics quanto no Google Calendar
+        
+        Com merge_slots, aulas seguidas da mesma matéria (separadas por no máximo merge_max_gap minutos)
+        viram um único evento. Feriados viram EXDATE e recessos dividem a recorrência em trechos.
         """
-        c = Calendar()
+        if not isinstance(schedule, Schedule):
+            schedule = Schedule.from_dict(schedule, slots_per_day=self.parser.aulas_por_dia)
         
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
-        today = date.today()
-        dias = ["segunda", "terça", "quarta", "quinta", "sexta"]
-
-        for dia_nome, materias in schedule.items():
-            if dia_nome not in dias:
-                continue
-
-            weekday_num = dias.index(dia_nome)
+        with metrics.timer("compile"):
+            end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
+            today = date.today()
+            term = self.holidays.term(today, end_dt)
+            time_slots = [
+                tuple(datetime.strptime(t, "%H:%M") for t in slot.split('-'))
+                for slot in self.parser.get_time_slots()
+            ]
+            
+            mergeable = None
+            if self.merge_slots:
+                # Só une aulas separadas por um intervalo curto (ex.: 08:15 -> 08:16), nunca pelo recreio
+                max_gap = timedelta(minutes=self.merge_max_gap)
+                mergeable = lambda slot: slot + 1 < len(time_slots) and time_slots[slot + 1][0] - time_slots[slot][1] <= max_gap
             
-            for i, materia in enumerate(materias):
-                if not materia or materia.lower() == "recreio":
+            events = []
+            blocks = schedule.iter_blocks(mergeable) if self.merge_slots else (
+                (weekday_num, slot, slot, materia) for weekday_num, slot, materia in schedule.iter_classes()
+            )
+            for weekday_num, first_slot, last_slot, materia in blocks:
+                if materia.lower() == "recreio":
                     continue
                 
-                time_slots = self.parser.get_time_slots()
-                start_time_str, end_time_str = time_slots[i].split('-')
-                
-                current_day = today
-                days_ahead = weekday_num - today.weekday()
-                if days_ahead < 0:
-                    days_ahead += 7
-                current_day += timedelta(days=days_ahead)
+                start_time = time_slots[first_slot][0].time()
+                end_time = time_slots[last_slot][1].time()
+                for segment, (segment_start, segment_end) in enumerate(term.segments):
+                    # Primeira ocorrência do dia da semana dentro do trecho
+                    current_day = segment_start + timedelta(days=(weekday_num - segment_start.weekday()) % 7)
+                    if current_day > segment_end:
+                        continue
+                    events.append({
+                        "materia": materia,
+                        "dia_semana": DIAS[weekday_num],
+                        "slot": first_slot + 1,
+                        "slot_count": last_slot - first_slot + 1,
+                        "segment": segment,
+                        "segment_end": segment_end,
+                        "start": datetime.combine(current_day, start_time),
+                        "end": datetime.combine(current_day, end_time),
+                        "rrule": f"FREQ=WEEKLY;UNTIL={segment_end.strftime('%Y%m%d')}T235959Z",
+                        "exdates": [
+                            datetime.combine(day, start_time)
+                            for day in term.exdates(weekday_num, current_day, segment_end)
+                        ],
+                    })
+            
+            metrics.inc("compiled_events", len(events))
+            return events
 
-                start_datetime = datetime.combine(
-                    current_day,
-                    datetime.strptime(start_time_str, "%H:%M").time()
-                )
-                
-                end_datetime = datetime.combine(
-                    current_day,
-                    datetime.strptime(end_time_str, "%H:%M").time()
-                )
-                
-                event = Event()
-                event.name = materia
-                event.begin = start_datetime.isoformat()
-                event.end = end_datetime.isoformat()
-                
-                # Adiciona regra de recorrência
-                event.add('RRULE', f'FREQ=WEEKLY;UNTIL={end_dt.strftime("%Y%m%d")}T235959Z')
-                
-                c.events.add(event)
+    def create_google_calendar_events(self, schedule: Schedule, end_date: str, class_id: Optional[str] = None,
+                                      compiled: Optional[List[Dict]] = None) -> Dict:
+        """
+        Cria os eventos no Google Calendar
         
-        filename = f"calendario_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ics"
-        filepath = self.output_dir / filename
+        A criação é um job retomável: os IDs dos eventos vêm do conteúdo do horário, então repetir
+        uma execução que falhou no meio só cria o que faltou, sem duplicar eventos (mesmo em outro dia).
+        """
+        if not self.google_manager:
+            raise ValueError("Google Calendar Manager não está inicializado.")
+        
+        if not self.google_manager.service:
+            self.google_manager.authenticate()
+        
+        if not isinstance(schedule, Schedule):
+            schedule = Schedule.from_dict(schedule, slots_per_day=self.parser.aulas_por_dia)
+        if compiled is None:
+            compiled = self.compile_events(schedule, end_date)
+        # Cópias: a mesma compilação pode estar sendo usada por outras saídas
+        compiled = [dict(event, recurrence=self._google_recurrence(event)) for event in compiled]
+        # A chave não usa as datas compiladas (que dependem de hoje): um job retomado no dia seguinte continua o mesmo
+        job_key = schedule_key(
+            schedule, end_date, class_id=class_id, calendar_id=self.google_manager.calendar_id, **self.export_options()
+        )[:20]
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.writelines(c.serialize_iter())
+        # O job remove os eventos anteriores da mesma turma (uma vez) antes de recriar
+        with bulk_logging(self.event_log_every):
+            return self.job_runner.run(job_key, compiled, class_id=class_id)
+    
+    @staticmethod
+    def _google_recurrence(event: Dict) -> List[str]:
+        """
+        Regra de recorrência no formato do Google Calendar, com os feriados como EXDATE
+        """
+        recurrence = [f"RRULE:{event['rrule']}"]
+        if event["exdates"]:
+            exdates = ",".join(d.strftime('%Y%m%dT%H%M%S') for d in event["exdates"])
+            recurrence.append(f"EXDATE;TZID=America/Sao_Paulo:{exdates}")
+        return recurrence
+    
+    @staticmethod
+    def event_uid(class_id: Optional[str], event: Dict) -> str:
+        """
+        UID estável do evento: o mesmo horário exportado de novo substitui o evento no calendário
+        """
+        source = f"{class_id or ''}|{event['dia_semana']}|{event['slot']}|{event.get('segment', 0)}"
+        return f"{hashlib.sha1(source.encode('utf-8')).hexdigest()}@calendar-generator"
+    
+    def render_ics(self, compiled_events: List[Dict], class_id: Optional[str] = None) -> str:
+        """
+        Monta o conteúdo .ics a partir dos eventos compilados
+        """
+        c = Calendar()
+        
+        for compiled in compiled_events:
+            event = Event(uid=self.event_uid(class_id, compiled))
+            event.name = compiled["materia"]
+            event.begin = compiled["start"].isoformat()
+            event.end = compiled["end"].isoformat()
+            
+            # Adiciona regra de recorrência e as datas sem aula (feriados)
+            event.extra.append(ContentLine(name='RRULE', value=compiled["rrule"]))
+            if compiled["exdates"]:
+                event.extra.append(ContentLine(
+                    name='EXDATE',
+                    value=",".join(d.strftime('%Y%m%dT%H%M%SZ') for d in compiled["exdates"])
+                ))
             
-        return str(filepath)
+            c.events.add(event)
+        
+        with metrics.timer("ics_serialize"):
+            return "".join(c.serialize_iter())
+    
+    def export_ics(self, schedule: Schedule, end_date: str, compiled: Optional[List[Dict]] = None) -> ExportArtifact:
+        """
+        Exporta o horário para .ics, reaproveitando o arquivo se o mesmo conteúdo já foi exportado
+        """
+        if not isinstance(schedule, Schedule):
+            schedule = Schedule.from_dict(schedule, slots_per_day=self.parser.aulas_por_dia)
+        class_id = schedule.class_id
+        key = schedule_key(schedule, end_date, **self.export_options())
+        # Com várias turmas, a turma no nome facilita achar o arquivo
+        prefix = f"calendario_{safe_class_id(class_id)}" if class_id else "calendario"
+        
+        artifact = self.export_cache.get(key, prefix)
+        if artifact is not None:
+            logger.info(f"Arquivo .ics reaproveitado: {artifact.path}")
+            return artifact
+        if compiled is None:
+            compiled = self.compile_events(schedule, end_date)
+        return self.export_cache.put(key, self.render_ics(compiled, class_id), prefix)
+    
+    def export_options(self) -> Dict:
+        """
+        Opções do gerador que mudam os eventos (entram na chave do cache e no ETag junto com o horário)
+        """
+        return {
+            "time_slots": self.parser.get_time_slots(),
+            "merge_slots": self.merge_slots,
+            "merge_max_gap": self.merge_max_gap,
+            "holidays": [day.isoformat() for day in self.holidays.holidays],
+            "recesses": [[start.isoformat(), end.isoformat()] for start, end in self.holidays.recesses],
+        }
+    
+    def create_ics_file(self, schedule: Schedule, end_date: str) -> str:
+        """
+        Cria um arquivo .ics com os eventos do calendário
+        """
+        return self.export_ics(schedule, end_date).path
 
 def main():
     """
@@ -180,12 +360,11 @@ def main():
     print("Processando imagem:", image_path)
     
     try:
+        result = generator.process_image(image_path, end_date or f"{date.today().year}-12-31")
         if use_google_calendar:
-            generator.process_image_and_create_events(image_path, end_date)
             print("Eventos criados no Google Calendar!")
         else:
-            ics_path = generator.process_image_and_create_ics(image_path, end_date)
-            print(f"Arquivo .ics gerado: {ics_path}")
+            print(f"Arquivo .ics gerado: {result}")
     except Exception as e:
         print(f"❌ Erro: {e}")
 
@@ -0,0 +1,246 @@
+import os
+import time
+import json
+import itertools
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prefixo das métricas na exposição Prometheus
+METRIC_PREFIX = "calendar_generator"
+
+# Perfilador usado por profile_job quando nenhum é informado ("cprofile" ou "pyinstrument")
+PROFILE_ENV = "CALENDAR_PROFILE"
+
+
+class Metrics:
+    """
+    Registro leve de contadores e timers, com exposição em JSON ou texto Prometheus
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        # nome/labels -> [contagem, soma, mínimo, máximo] em segundos
+        self._timers: Dict[Tuple, list] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Incrementa um contador
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """
+        Registra uma duração no timer informado
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            stats = self._timers.get(key)
+            if stats is None:
+                self._timers[key] = [1, seconds, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = min(stats[2], seconds)
+                stats[3] = max(stats[3], seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Mede o tempo do bloco; em caso de exceção também conta um erro
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(f"{name}_errors", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        """
+        Decorador equivalente a timer()
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def snapshot(self) -> Dict:
+        """
+        Retorna uma cópia das métricas atuais
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+            timers = [
+                {"name": name, "labels": dict(labels), "count": count, "sum": total, "min": low, "max": high}
+                for (name, labels), (count, total, low, high) in self._timers.items()
+            ]
+        return {"counters": counters, "timers": timers}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False)
+
+    def to_prometheus(self) -> str:
+        """
+        Exposição no formato texto do Prometheus (timers como summary em segundos)
+        """
+        snapshot = self.snapshot()
+        # Linhas da mesma métrica precisam ficar juntas, logo após o TYPE
+        snapshot["counters"].sort(key=lambda counter: counter["name"])
+        snapshot["timers"].sort(key=lambda timer: timer["name"])
+        lines = []
+        declared = set()
+        for counter in snapshot["counters"]:
+            metric = f"{METRIC_PREFIX}_{counter['name']}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(counter['labels'])} {counter['value']:g}")
+        for timer in snapshot["timers"]:
+            metric = f"{METRIC_PREFIX}_{timer['name']}_seconds"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} summary")
+                declared.add(metric)
+            labels = _format_labels(timer['labels'])
+            lines.append(f"{metric}_count{labels} {timer['count']}")
+            lines.append(f"{metric}_sum{labels} {timer['sum']:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+# Registro global usado pelo parser, gerador e Google Calendar
+metrics = Metrics()
+
+
+class EventLogSampler:
+    """
+    Controla os logs por evento: 1 registra todos, N registra um a cada N, 0 suprime
+
+    A amostragem é de cada thread (bulk_logging em uma thread não afeta as outras);
+    sem ajuste, vale default_every.
+    """
+
+    def __init__(self, sample_every: int = 1):
+        self.default_every = sample_every
+        self._local = threading.local()
+        self._counter = itertools.count()
+
+    @property
+    def sample_every(self) -> int:
+        return getattr(self._local, "sample_every", self.default_every)
+
+    @sample_every.setter
+    def sample_every(self, value: int):
+        self._local.sample_every = value
+
+    def log(self, log: logging.Logger, message: str, level: int = logging.INFO):
+        if self.sample_every <= 0:
+            return
+        if next(self._counter) % self.sample_every == 0 and log.isEnabledFor(level):
+            log.log(level, message)
+
+
+event_log = EventLogSampler()
+
+
+def log_event(log: logging.Logger, message: str, level: int = logging.INFO):
+    """
+    Registra um log por evento respeitando a amostragem atual
+    """
+    event_log.log(log, message, level)
+
+
+@contextmanager
+def bulk_logging(sample_every: int = 0):
+    """
+    Durante operações em lote, amostra (ou suprime, com 0) os logs por evento da thread atual
+    """
+    previous = event_log.sample_every
+    event_log.sample_every = sample_every
+    try:
+        yield
+    finally:
+        event_log.sample_every = previous
+
+
+@contextmanager
+def profile_job(name: str, backend: Optional[str] = None, output_dir: str = "profiles"):
+    """
+    Perfila um job com cProfile ou pyinstrument e salva o resultado em output_dir
+
+    Sem backend (nem a variável CALENDAR_PROFILE), não faz nada. Um perfilador desconhecido
+    só gera um aviso: o job roda normalmente, sem perfil.
+    """
+    backend = backend or os.environ.get(PROFILE_ENV)
+    if not backend:
+        yield
+        return
+    if backend not in ("pyinstrument", "cprofile"):
+        logger.warning(f"Perfilador desconhecido: {backend} (use pyinstrument ou cprofile), perfil ignorado")
+        yield
+        return
+
+    Path(output_dir).mkdir(exist_ok=True)
+    stem = Path(output_dir) / f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    if backend == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument não está instalado, perfil ignorado")
+            yield
+            return
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(f"{stem}.html", 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+            logger.info(f"Perfil salvo em {stem}.html")
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{stem}.prof")
+            logger.info(f"Perfil salvo em {stem}.prof")
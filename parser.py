@@ -3,16 +3,21 @@ from PIL import Image
 import re
 from typing import Dict, List, Optional
 import logging
+from metrics import metrics
+from adaptive_ocr import AdaptiveOcr, OcrResult, OcrWord
+from layout_parser import LayoutParser, LayoutResult
+from schedule import Schedule, DIAS
 
 class ScheduleParser:
     """
     Parser para extrair horários escolares de imagens usando OCR
     """
     
-    def __init__(self):
+    def __init__(self, turno: str = "manha"):
         self.logger = logging.getLogger(__name__)
         
         # Configurações padrão
+        self.turno = turno
         self.aulas_por_dia = 5
         self.horario_inicio = "07:30"
         self.horario_fim = "11:30"
@@ -44,7 +49,16 @@ class ScheduleParser:
             'sociologia', 'sociology', 'socio',
             'recreio', 'intervalo', 'break'
         ]
+        
+        # Cache de normalize_cell (texto da célula -> matéria)
+        self._cell_cache: Dict[str, str] = {}
+        
+        # OCR em várias passadas, guiado pela confiança (usado por extract_text_with_confidence)
+        self.adaptive_ocr = AdaptiveOcr(lang='por')
+        # Reconstrução da grade pelas caixas das palavras
+        self.layout_parser = LayoutParser(self)
     
+    @metrics.timed("ocr")
     def extract_text_from_image(self, image_path: str) -> str:
         """
         Extrai texto da imagem usando OCR
@@ -66,6 +80,41 @@ class ScheduleParser:
             self.logger.error(f"Erro ao extrair texto da imagem: {e}")
             raise
     
+    @metrics.timed("ocr", mode="adaptive")
+    def extract_text_with_confidence(self, image_path: str) -> OcrResult:
+        """
+        Extrai o texto com o OCR adaptativo, mantendo a confiança de cada linha (célula)
+        """
+        try:
+            with Image.open(image_path) as image:
+                result = self.adaptive_ocr.read(image)
+            
+            self.logger.info(
+                f"Texto extraído da imagem: {len(result.text)} caracteres, "
+                f"{result.retried} linhas relidas ({result.improved} melhoradas)"
+            )
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"Erro ao extrair texto da imagem: {e}")
+            raise
+    
+    def parse_schedule_layout(self, image_path: str, class_id: Optional[str] = None) -> Optional[LayoutResult]:
+        """
+        Lê a imagem uma vez e monta a grade pela posição das palavras (dia por coluna ou por linha)
+        
+        Retorna None se a imagem não tiver um cabeçalho de dias reconhecível.
+        """
+        result = self.extract_text_with_confidence(image_path)
+        return self.parse_schedule_from_words(result.words, class_id=class_id)
+    
+    @metrics.timed("parse", mode="layout")
+    def parse_schedule_from_words(self, words: List[OcrWord], class_id: Optional[str] = None) -> Optional[LayoutResult]:
+        """
+        Monta a grade dias x aulas a partir das caixas das palavras do OCR
+        """
+        return self.layout_parser.parse(words, class_id=class_id)
+    
     def clean_text(self, text: str) -> str:
         """
         Limpa e normaliza o texto extraído
@@ -84,8 +133,9 @@ class ScheduleParser:
     def identify_days(self, text: str) -> Dict[str, int]:
         dias = ["SEGUNDA", "TERÇA", "QUARTA", "QUINTA", "SEXTA"]
         indices = {}
+        upper = text.upper()
         for dia in dias:
-            idx = text.upper().find(dia)
+            idx = upper.find(dia)
             if idx != -1:
                 indices[dia.lower()] = idx
         # Se não encontrar, tente por linhas
@@ -104,32 +154,50 @@ class ScheduleParser:
         day_text = text[day_start:day_end] if day_end else text[day_start:]
         
         subjects = []
-        lines = day_text.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Procura por matérias conhecidas
-            found_subject = None
-            for materia in self.materias_comuns:
-                if materia in line.lower():
-                    found_subject = materia
+        for line in day_text.split('\n'):
+            subject = self.normalize_cell(line)
+            if subject:
+                subjects.append(subject)
+        
+        return subjects
+    
+    def normalize_cell(self, cell: str) -> Optional[str]:
+        """
+        Identifica a matéria de uma linha do OCR ou célula de planilha (com cache, pois as matérias se repetem)
+        """
+        line = cell.strip()
+        if not line:
+            return None
+        
+        subject = self._cell_cache.get(line)
+        if subject is None:
+            # Procura por matérias conhecidas, as mais longas primeiro ("educação física" antes de "física")
+            lower = line.lower()
+            for materia in sorted(self.materias_comuns, key=len, reverse=True):
+                if materia in lower:
+                    # Normaliza o nome da matéria
+                    subject = self.normalize_subject_name(materia)
                     break
-            
-            if found_subject:
-                # Normaliza o nome da matéria
-                normalized_subject = self.normalize_subject_name(found_subject)
-                subjects.append(normalized_subject)
             else:
-                # Se não encontrou uma matéria conhecida, tenta extrair palavras
-                words = line.split()
-                if words:
-                    # Pega a primeira palavra como possível matéria
-                    subjects.append(words[0].title())
+                # Se não encontrou uma matéria conhecida, pega a primeira palavra como possível matéria
+                subject = line.split()[0].title()
+            if len(self._cell_cache) < 10000:
+                self._cell_cache[line] = subject
+        return subject
+    
+    def normalize_table_cell(self, cell: str) -> Optional[str]:
+        """
+        Identifica a matéria de uma célula de planilha
         
-        return subjects
+        O texto já vem limpo: só os nomes conhecidos são padronizados ("Ed. Física" -> "Educação Física"),
+        sem a busca por trechos do OCR, que trocaria "Geometria" por "Geo".
+        """
+        line = " ".join(cell.split())
+        if not line:
+            return None
+        if line.lower() in self.materias_comuns:
+            return self.normalize_subject_name(line)
+        return line
     
     def normalize_subject_name(self, subject: str) -> str:
         """
@@ -166,43 +234,31 @@ class ScheduleParser:
         
         return normalization_map.get(subject, subject.title())
     
-    def parse_schedule(self, image_path: str) -> Dict[str, List[str]]:
+    def parse_schedule(self, image_path: str) -> Schedule:
         """
         Função principal que faz o parsing completo do horário
         """
         raw_text = self.extract_text_from_image(image_path)
-        lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
-        dias = ["segunda", "terça", "quarta", "quinta", "sexta"]
-        horarios = {}
-        # Pula a primeira linha se não for matéria
-        start_idx = 0
-        if not any(dia in lines[0].lower() for dia in dias):
-            start_idx = 1
-        for i, dia in enumerate(dias):
-            materias = lines[start_idx + i*5 : start_idx + (i+1)*5]
-            # Se faltar matéria, preenche com "???"
-            while len(materias) < 5:
-                materias.append("???")
-            horarios[dia] = materias
-        return horarios
+        return self.parse_schedule_from_text(raw_text)
     
-    def parse_schedule_from_text(self, text: str) -> Dict[str, List[str]]:
+    @metrics.timed("parse")
+    def parse_schedule_from_text(self, text: str, class_id: Optional[str] = None) -> Schedule:
         """
         Mesma lógica do parse_schedule, mas recebe texto direto
         """
         lines = [line.strip() for line in text.splitlines() if line.strip()]
-        dias = ["segunda", "terça", "quarta", "quinta", "sexta"]
-        horarios = {}
+        horarios = Schedule(class_id=class_id, slots_per_day=self.aulas_por_dia)
+        if not lines:
+            return horarios
         # Pula a primeira linha se não for matéria
         start_idx = 0
-        if not any(dia in lines[0].lower() for dia in dias):
+        if not any(dia in lines[0].lower() for dia in DIAS):
             start_idx = 1
-        for i, dia in enumerate(dias):
-            materias = lines[start_idx + i*5 : start_idx + (i+1)*5]
-            # Se faltar matéria, preenche com "???"
-            while len(materias) < 5:
-                materias.append("???")
-            horarios[dia] = materias
+        for i, dia in enumerate(DIAS):
+            # Aulas que faltarem ficam vazias ("???")
+            materias = lines[start_idx + i*self.aulas_por_dia : start_idx + (i+1)*self.aulas_por_dia]
+            for slot, materia in enumerate(materias):
+                horarios.set(dia, slot, materia)
         return horarios
     
     def get_time_slots(self) -> List[str]:
@@ -217,29 +273,21 @@ class ScheduleParser:
             "10:46-11:30"
         ]
     
-    def process_schedule(self, schedule: Dict[str, List[str]]) -> Dict[int, Dict[str, Optional[str]]]:
+    def process_schedule(self, schedule: Schedule) -> Dict[int, Dict[str, Optional[str]]]:
         """
         Processa o horário extraído e o organiza em um dicionário estruturado
         """
-        resultado = {}
+        if not isinstance(schedule, Schedule):
+            schedule = Schedule.from_dict(schedule, slots_per_day=self.aulas_por_dia)
         
-        # Dias da semana em português
-        dias = ["segunda", "terça", "quarta", "quinta", "sexta"]
+        # Cria uma entrada (vazia) para cada aula de cada dia
+        resultado = {
+            weekday_num: {i: None for i in range(1, self.aulas_por_dia + 1)}
+            for weekday_num in range(len(DIAS))
+        }
         
-        # Itera sobre os dias e matérias no horário
-        for dia, materias in schedule.items():
-            if dia not in dias:
-                continue
-            dia_padrao = "terca" if dia in ["terca", "terça"] else dia
-            weekday_num = ["segunda", "terca", "quarta", "quinta", "sexta"].index(dia_padrao)
-            
-            for aula_num, materia in enumerate(materias):
-                # Cria uma entrada para cada aula
-                if weekday_num not in resultado:
-                    resultado[weekday_num] = {i: None for i in range(1, self.aulas_por_dia + 1)}
-                
-                # Adiciona a matéria à hora correspondente
-                resultado[weekday_num][aula_num + 1] = materia if materia != "???" else None
+        # Adiciona as matérias às horas correspondentes
+        for weekday_num, slot, materia in schedule.iter_classes():
+            resultado[weekday_num][slot + 1] = materia
         
-
         return resultado
@@ -0,0 +1,268 @@
+import sys
+import struct
+import threading
+from array import array
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# Dias letivos, na ordem da grade
+DIAS = ("segunda", "terça", "quarta", "quinta", "sexta")
+AULAS_POR_DIA = 5
+
+# Valor usado nas listas por dia quando a aula não foi identificada
+MATERIA_VAZIA = "???"
+
+_DIA_INDEX = {dia: i for i, dia in enumerate(DIAS)}
+_DIA_INDEX["terca"] = 1
+
+# Formato binário: "SCH1", aulas por dia, número de matérias, tamanho do class_id
+_HEADER = struct.Struct("<4sBHH")
+_MAGIC = b"SCH1"
+
+
+class SubjectTable:
+    """
+    Tabela compartilhada de matérias: cada nome é guardado uma vez e referenciado por um id (0 = vazio)
+    """
+
+    __slots__ = ("_names", "_ids", "_lock", "max_size")
+
+    def __init__(self, max_size: int = 0xFFFF):
+        self._names: List[Optional[str]] = [None]
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.max_size = max_size
+
+    def intern(self, name: Optional[str]) -> int:
+        """
+        Retorna o id da matéria, cadastrando-a se necessário
+        """
+        if not name or name == MATERIA_VAZIA:
+            return 0
+        subject_id = self._ids.get(name)
+        if subject_id is None:
+            with self._lock:
+                subject_id = self._ids.get(name)
+                if subject_id is None:
+                    if len(self._names) > self.max_size:
+                        raise OverflowError("Tabela de matérias cheia")
+                    subject_id = len(self._names)
+                    self._names.append(name)
+                    self._ids[name] = subject_id
+        return subject_id
+
+    def name(self, subject_id: int) -> Optional[str]:
+        return self._names[subject_id]
+
+    def __len__(self) -> int:
+        return len(self._names) - 1
+
+
+# Tabela usada por padrão pelos horários novos; quando enche, é trocada por outra (ver default_subjects)
+_default_subjects = SubjectTable()
+_default_lock = threading.Lock()
+
+
+def default_subjects() -> SubjectTable:
+    """
+    Tabela de matérias atual, compartilhada pelos horários criados sem uma tabela própria
+    """
+    return _default_subjects
+
+
+def _next_subjects(full: SubjectTable) -> SubjectTable:
+    """
+    Troca a tabela padrão cheia por uma nova
+
+    A tabela antiga não cresce mais e é liberada quando o último horário que a usa some,
+    então um processo de longa duração (service.py) não fica preso a uma tabela cheia.
+    """
+    global _default_subjects
+    with _default_lock:
+        if _default_subjects is full:
+            _default_subjects = SubjectTable(full.max_size)
+        return _default_subjects
+
+
+def day_index(dia: Union[str, int]) -> int:
+    """
+    Converte o nome do dia (ou o índice) para a posição na grade
+    """
+    if isinstance(dia, int):
+        if not 0 <= dia < len(DIAS):
+            raise KeyError(dia)
+        return dia
+    return _DIA_INDEX[dia.lower()]
+
+
+class Schedule:
+    """
+    Horário semanal de uma turma em grade fixa dias x aulas, com matérias internadas
+
+    A grade é um array de ids de 16 bits que apontam para uma SubjectTable compartilhada,
+    então milhares de turmas ocupam poucos bytes cada. Para compatibilidade, também se
+    comporta como o antigo Dict[str, List[str]] (keys/items/[dia]).
+    """
+
+    __slots__ = ("class_id", "slots_per_day", "subjects", "_grid")
+
+    def __init__(self, class_id: Optional[str] = None, slots_per_day: int = AULAS_POR_DIA,
+                 subjects: Optional[SubjectTable] = None):
+        self.class_id = class_id
+        self.slots_per_day = slots_per_day
+        self.subjects = subjects or default_subjects()
+        self._grid = array("H", bytes(2 * len(DIAS) * slots_per_day))
+
+    @classmethod
+    def from_dict(cls, schedule: Dict[str, List[str]], class_id: Optional[str] = None,
+                  slots_per_day: int = AULAS_POR_DIA, subjects: Optional[SubjectTable] = None) -> "Schedule":
+        """
+        Cria o horário a partir do formato antigo {dia: [matérias]}
+        """
+        compact = cls(class_id, slots_per_day, subjects)
+        for dia, materias in schedule.items():
+            if dia.lower() not in _DIA_INDEX:
+                continue
+            for slot, materia in enumerate(materias[:slots_per_day]):
+                compact.set(dia, slot, materia)
+        return compact
+
+    def set(self, dia: Union[str, int], slot: int, materia: Optional[str]):
+        """
+        Define a matéria da aula (slot começa em 0)
+        """
+        if not 0 <= slot < self.slots_per_day:
+            raise IndexError(slot)
+        position = day_index(dia) * self.slots_per_day + slot
+        try:
+            subject_id = self.subjects.intern(materia)
+        except OverflowError:
+            # Tabela cheia: o horário passa para a tabela padrão seguinte, com as matérias que já tinha
+            self._rebase(_next_subjects(self.subjects))
+            subject_id = self.subjects.intern(materia)
+        self._grid[position] = subject_id
+
+    def _rebase(self, subjects: SubjectTable):
+        names = self.subjects._names
+        self._grid = array("H", (subjects.intern(names[i]) if i else 0 for i in self._grid))
+        self.subjects = subjects
+
+    def get_subject(self, dia: Union[str, int], slot: int) -> Optional[str]:
+        if not 0 <= slot < self.slots_per_day:
+            raise IndexError(slot)
+        return self.subjects.name(self._grid[day_index(dia) * self.slots_per_day + slot])
+
+    def iter_classes(self) -> Iterator[Tuple[int, int, str]]:
+        """
+        Percorre as aulas preenchidas como (índice do dia, slot, matéria)
+        """
+        names = self.subjects._names
+        for position, subject_id in enumerate(self._grid):
+            if subject_id:
+                weekday_num, slot = divmod(position, self.slots_per_day)
+                yield weekday_num, slot, names[subject_id]
+
+    def iter_blocks(self, mergeable: Optional[Callable[[int], bool]] = None) -> Iterator[Tuple[int, int, int, str]]:
+        """
+        Percorre as aulas unindo aulas seguidas da mesma matéria, como (dia, primeiro slot, último slot, matéria)
+
+        mergeable(slot) diz se a aula slot pode ser unida à seguinte (ex.: só se o intervalo entre elas for curto);
+        sem ele, aulas seguidas da mesma matéria são sempre unidas.
+        """
+        names = self.subjects._names
+        grid = self._grid
+        for weekday_num in range(len(DIAS)):
+            base = weekday_num * self.slots_per_day
+            slot = 0
+            while slot < self.slots_per_day:
+                subject_id = grid[base + slot]
+                if not subject_id:
+                    slot += 1
+                    continue
+                last = slot
+                while (last + 1 < self.slots_per_day and grid[base + last + 1] == subject_id
+                       and (mergeable is None or mergeable(last))):
+                    last += 1
+                yield weekday_num, slot, last, names[subject_id]
+                slot = last + 1
+
+    # Interface de dicionário {dia: [matérias]} usada pelo código antigo
+
+    def __getitem__(self, dia: str) -> List[str]:
+        start = day_index(dia) * self.slots_per_day
+        names = self.subjects._names
+        return [names[i] or MATERIA_VAZIA for i in self._grid[start:start + self.slots_per_day]]
+
+    def __contains__(self, dia) -> bool:
+        return isinstance(dia, str) and dia.lower() in _DIA_INDEX
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(DIAS)
+
+    def __len__(self) -> int:
+        return len(DIAS)
+
+    def keys(self):
+        return list(DIAS)
+
+    def items(self) -> List[Tuple[str, List[str]]]:
+        return [(dia, self[dia]) for dia in DIAS]
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        return dict(self.items())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Schedule):
+            return self.class_id == other.class_id and self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Schedule(class_id={self.class_id!r}, {self.to_dict()!r})"
+
+    # Serialização binária compacta (autocontida: leva só as matérias usadas)
+
+    def to_bytes(self) -> bytes:
+        local_ids: Dict[int, int] = {}
+        names = []
+        grid = array("H")
+        for subject_id in self._grid:
+            if subject_id and subject_id not in local_ids:
+                local_ids[subject_id] = len(names) + 1
+                names.append(self.subjects.name(subject_id).encode("utf-8"))
+            grid.append(local_ids.get(subject_id, 0))
+        class_id = (self.class_id or "").encode("utf-8")
+        parts = [_HEADER.pack(_MAGIC, self.slots_per_day, len(names), len(class_id)), class_id]
+        for name in names:
+            parts.append(struct.pack("<H", len(name)))
+            parts.append(name)
+        if sys.byteorder == "big":
+            grid.byteswap()
+        parts.append(grid.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, subjects: Optional[SubjectTable] = None) -> "Schedule":
+        magic, slots_per_day, count, class_id_len = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Formato de horário inválido")
+        offset = _HEADER.size
+        class_id = data[offset:offset + class_id_len].decode("utf-8") or None
+        offset += class_id_len
+        names = []
+        for _ in range(count):
+            (length,) = struct.unpack_from("<H", data, offset)
+            offset += 2
+            names.append(data[offset:offset + length].decode("utf-8"))
+            offset += length
+        subjects = subjects or default_subjects()
+        try:
+            ids = [0] + [subjects.intern(name) for name in names]
+        except OverflowError:
+            subjects = _next_subjects(subjects)
+            ids = [0] + [subjects.intern(name) for name in names]
+        grid = array("H")
+        grid.frombytes(data[offset:offset + 2 * len(DIAS) * slots_per_day])
+        if sys.byteorder == "big":
+            grid.byteswap()
+        schedule = cls(class_id, slots_per_day, subjects)
+        schedule._grid = array("H", (ids[i] for i in grid))
+        return schedule
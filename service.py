@@ -0,0 +1,392 @@
+import io
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from documents import DOCUMENT_SUFFIXES, iter_document_schedules, worker_parser
+from export_cache import etag_matches, make_etag, safe_class_id, schedule_key
+from metrics import metrics
+from schedule import Schedule
+
+logger = logging.getLogger(__name__)
+
+# Requisições processadas ao mesmo tempo (as demais esperam até QUEUE_TIMEOUT e recebem 503)
+MAX_CONCURRENCY = 16
+QUEUE_TIMEOUT = 10.0
+
+# Tamanho máximo do upload de imagens/documentos
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# Pedaços do corpo .ics enviados por vez
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Rotas que não entram no limite de concorrência
+UNLIMITED_PATHS = ("/health", "/metrics")
+
+# Tipos de upload tratados como documentos de várias páginas
+_DOCUMENT_TYPES = {"application/pdf": ".pdf", "image/tiff": ".tiff"}
+
+GENERATOR = web.AppKey("generator", object)
+GOOGLE_GENERATOR = web.AppKey("google_generator", object)
+GOOGLE_LOCK = web.AppKey("google_lock", asyncio.Lock)
+LIMIT = web.AppKey("limit", asyncio.Semaphore)
+OCR_POOL = web.AppKey("ocr_pool", ProcessPoolExecutor)
+SETTINGS = web.AppKey("settings", dict)
+
+
+def _ocr_image(data: bytes, turno: str) -> Dict:
+    """
+    OCR adaptativo e montagem da grade de uma imagem (roda em um processo do pool)
+    """
+    from PIL import Image
+
+    start = time.perf_counter()
+    parser = worker_parser(turno)
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        result = parser.adaptive_ocr.read(image)
+    layout = parser.parse_schedule_from_words(result.words)
+    if layout is not None and layout.cells:
+        schedule, orientation = layout.schedule, layout.orientation
+    else:
+        schedule, orientation = parser.parse_schedule_from_text(result.text), None
+    return {
+        "text": result.text,
+        "lines": [{"text": line.text, "confidence": round(line.conf, 1), "retried": line.retried} for line in result.lines],
+        "orientation": orientation,
+        "schedule": schedule.to_dict(),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _json_error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+@web.middleware
+async def concurrency_limit(request: web.Request, handler):
+    """
+    Limita as requisições em andamento; quem esperar mais que queue_timeout recebe 503 com Retry-After
+    """
+    if request.path in UNLIMITED_PATHS:
+        return await handler(request)
+
+    limit = request.app[LIMIT]
+    try:
+        await asyncio.wait_for(limit.acquire(), timeout=request.app[SETTINGS]["queue_timeout"])
+    except asyncio.TimeoutError:
+        metrics.inc("service_rejected")
+        response = _json_error(503, "Servidor ocupado, tente novamente")
+        response.headers["Retry-After"] = "1"
+        return response
+
+    settings = request.app[SETTINGS]
+    settings["in_flight"] += 1
+    route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+    try:
+        with metrics.timer("service_request", route=route):
+            response = await handler(request)
+        metrics.inc("service_requests", route=route, status=response.status)
+        return response
+    finally:
+        settings["in_flight"] -= 1
+        limit.release()
+
+
+async def _read_payload(request: web.Request) -> Dict:
+    try:
+        payload = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Corpo JSON inválido"}), content_type="application/json")
+    if not isinstance(payload, dict):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "O corpo deve ser um objeto JSON"}), content_type="application/json")
+    return payload
+
+
+def _schedule_from_payload(generator, payload: Dict) -> Schedule:
+    """
+    Monta o horário a partir de "text" (texto do OCR) ou "schedule" ({dia: [matérias]})
+    """
+    class_id = payload.get("class_id")
+    if class_id is not None and not isinstance(class_id, str):
+        raise ValueError('"class_id" deve ser um texto')
+    if isinstance(payload.get("schedule"), dict):
+        return Schedule.from_dict(payload["schedule"], class_id=class_id, slots_per_day=generator.parser.aulas_por_dia)
+    if isinstance(payload.get("text"), str):
+        return generator.parser.parse_schedule_from_text(payload["text"], class_id=class_id)
+    raise ValueError('Informe "text" ou "schedule"')
+
+
+def _end_date(payload: Dict) -> str:
+    end_date = payload.get("end_date") or f"{date.today().year}-12-31"
+    if not isinstance(end_date, str):
+        raise ValueError('"end_date" deve ser uma data AAAA-MM-DD')
+    date.fromisoformat(end_date)
+    return end_date
+
+
+async def health(request: web.Request) -> web.Response:
+    settings = request.app[SETTINGS]
+    return web.json_response({
+        "status": "ok",
+        "max_concurrency": settings["max_concurrency"],
+        "in_flight": settings["in_flight"],
+        "ocr_workers": settings["ocr_workers"],
+        "google": request.app[GOOGLE_GENERATOR] is not None,
+    })
+
+
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    if request.query.get("format") == "json":
+        return web.json_response(metrics.snapshot())
+    return web.Response(text=metrics.to_prometheus(), content_type="text/plain", charset="utf-8")
+
+
+async def ocr(request: web.Request) -> web.StreamResponse:
+    """
+    POST /ocr com a imagem no corpo (ou em um campo multipart "file")
+
+    Imagens devolvem um JSON com texto, confiança por linha e a grade; PDF/TIFF devolvem
+    NDJSON, uma linha por página, enviada assim que a página fica pronta.
+    """
+    filename = None
+    if request.content_type.startswith("multipart/"):
+        reader = await request.multipart()
+        field = await reader.next()
+        if field is None:
+            return _json_error(400, "Nenhum arquivo enviado")
+        filename = field.filename
+        content_type = field.headers.get("Content-Type", "")
+        data = await field.read(decode=False)
+    else:
+        content_type = request.content_type
+        data = await request.read()
+    if not data:
+        return _json_error(400, "Nenhum arquivo enviado")
+
+    suffix = _DOCUMENT_TYPES.get(content_type)
+    if filename and os.path.splitext(filename)[1].lower() in DOCUMENT_SUFFIXES:
+        suffix = os.path.splitext(filename)[1].lower()
+    if suffix:
+        return await _ocr_document(request, data, suffix)
+
+    loop = asyncio.get_running_loop()
+    settings = request.app[SETTINGS]
+    try:
+        result = await loop.run_in_executor(request.app[OCR_POOL], _ocr_image, data, settings["turno"])
+    except Exception as e:
+        logger.error(f"Erro no OCR: {e}")
+        return _json_error(422, f"Erro ao ler a imagem: {e}")
+    metrics.observe("service_ocr", result["seconds"])
+    return web.json_response(result)
+
+
+async def _ocr_document(request: web.Request, data: bytes, suffix: str) -> web.StreamResponse:
+    """
+    Lê um documento de várias páginas e envia cada página como uma linha NDJSON
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+
+    loop = asyncio.get_running_loop()
+    pages: asyncio.Queue = asyncio.Queue(maxsize=4)
+    settings = request.app[SETTINGS]
+
+    cancelled = threading.Event()
+
+    def produce():
+        # As páginas vão para o pool de OCR do serviço; a fila limitada segura o OCR se o cliente ler devagar
+        try:
+            for page in iter_document_schedules(path, workers=settings["ocr_workers"], turno=settings["turno"],
+                                                executor=request.app[OCR_POOL]):
+                if cancelled.is_set():
+                    break
+                item = {
+                    "page": page.page,
+                    "class_id": page.schedule.class_id,
+                    "confidence": round(page.confidence, 1),
+                    "orientation": page.orientation,
+                    "schedule": page.schedule.to_dict(),
+                }
+                asyncio.run_coroutine_threadsafe(pages.put(item), loop).result()
+        except Exception as e:
+            asyncio.run_coroutine_threadsafe(pages.put({"error": str(e)}), loop).result()
+        finally:
+            asyncio.run_coroutine_threadsafe(pages.put(None), loop).result()
+            os.remove(path)
+
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+    await response.prepare(request)
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await pages.get()
+            if item is None:
+                break
+            await response.write((json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8"))
+    except BaseException:
+        # Cliente desconectou: para o OCR das páginas restantes e esvazia a fila para a thread terminar
+        cancelled.set()
+        while await pages.get() is not None:
+            pass
+        raise
+    finally:
+        await producer
+    await response.write_eof()
+    return response
+
+
+async def parse(request: web.Request) -> web.Response:
+    """
+    POST /parse {"text": ..., "class_id": ...}: monta o horário a partir do texto
+    """
+    payload = await _read_payload(request)
+    generator = request.app[GENERATOR]
+    try:
+        schedule = await asyncio.to_thread(_schedule_from_payload, generator, payload)
+    except ValueError as e:
+        return _json_error(400, str(e))
+    return web.json_response({"class_id": schedule.class_id, "schedule": schedule.to_dict()})
+
+
+async def ics(request: web.Request) -> web.StreamResponse:
+    """
+    POST /ics {"text" ou "schedule", "end_date", "class_id"}: devolve o calendário .ics em streaming
+
+    O ETag vem do horário, da data final e das opções do gerador; com If-None-Match igual,
+    responde 304 sem compilar nem renderizar.
+    """
+    payload = await _read_payload(request)
+    generator = request.app[GENERATOR]
+
+    def schedule_and_key():
+        schedule = _schedule_from_payload(generator, payload)
+        end_date = _end_date(payload)
+        return schedule, end_date, schedule_key(schedule, end_date, **generator.export_options())
+
+    try:
+        schedule, end_date, key = await asyncio.to_thread(schedule_and_key)
+    except ValueError as e:
+        return _json_error(400, str(e))
+
+    etag = make_etag(key)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return web.Response(status=304, headers={"ETag": etag})
+
+    def compile_and_render():
+        return generator.render_ics(generator.compile_events(schedule, end_date), schedule.class_id)
+
+    body = await asyncio.to_thread(compile_and_render)
+    class_id = safe_class_id(schedule.class_id) if schedule.class_id else "horario"
+    filename = f"calendario_{class_id}.ics"
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/calendar; charset=utf-8",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "ETag": etag,
+    })
+    response.enable_compression()
+    await response.prepare(request)
+    data = body.encode("utf-8")
+    for start in range(0, len(data), STREAM_CHUNK_SIZE):
+        await response.write(data[start:start + STREAM_CHUNK_SIZE])
+    await response.write_eof()
+    return response
+
+
+async def sync(request: web.Request) -> web.Response:
+    """
+    POST /sync {"text" ou "schedule", "end_date", "class_id"}: cria (ou retoma) os eventos no Google Calendar
+    """
+    google_generator = request.app[GOOGLE_GENERATOR]
+    if google_generator is None:
+        return _json_error(503, "Google Calendar não configurado (inicie o serviço com --google-calendar)")
+    payload = await _read_payload(request)
+    try:
+        schedule = _schedule_from_payload(google_generator, payload)
+        end_date = _end_date(payload)
+    except ValueError as e:
+        return _json_error(400, str(e))
+
+    # O cliente do Google não é thread-safe: uma sincronização por vez
+    async with request.app[GOOGLE_LOCK]:
+        try:
+            summary = await asyncio.to_thread(
+                google_generator.create_google_calendar_events, schedule, end_date, schedule.class_id
+            )
+        except Exception as e:
+            logger.error(f"Erro ao sincronizar com o Google Calendar: {e}")
+            return _json_error(502, f"Erro no Google Calendar: {e}")
+    return web.json_response({"class_id": schedule.class_id, **summary})
+
+
+def create_app(generator=None, google_generator=None, max_concurrency: int = MAX_CONCURRENCY,
+               queue_timeout: float = QUEUE_TIMEOUT, ocr_workers: Optional[int] = None,
+               turno: str = "manha") -> web.Application:
+    """
+    Cria a aplicação aiohttp com as rotas do serviço
+    """
+    if generator is None:
+        from main import CalendarGenerator
+        generator = CalendarGenerator(turno=turno)
+
+    app = web.Application(middlewares=[concurrency_limit], client_max_size=MAX_UPLOAD_BYTES)
+    app[GENERATOR] = generator
+    app[GOOGLE_GENERATOR] = google_generator
+    app[GOOGLE_LOCK] = asyncio.Lock()
+    app[LIMIT] = asyncio.Semaphore(max_concurrency)
+    app[SETTINGS] = {
+        "max_concurrency": max_concurrency,
+        "queue_timeout": queue_timeout,
+        "ocr_workers": ocr_workers or os.cpu_count() or 1,
+        "turno": turno,
+        "in_flight": 0,
+    }
+
+    async def ocr_pool(app: web.Application):
+        # O OCR usa CPU: roda em processos separados para não travar o loop
+        app[OCR_POOL] = ProcessPoolExecutor(max_workers=app[SETTINGS]["ocr_workers"])
+        yield
+        app[OCR_POOL].shutdown(wait=True, cancel_futures=True)
+
+    app.cleanup_ctx.append(ocr_pool)
+    app.add_routes([
+        web.get("/health", health),
+        web.get("/metrics", metrics_endpoint),
+        web.post("/ocr", ocr),
+        web.post("/parse", parse),
+        web.post("/ics", ics),
+        web.post("/sync", sync),
+    ])
+    return app
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Serviço HTTP para converter horários escolares em calendários")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="requisições processadas ao mesmo tempo")
+    arg_parser.add_argument("--ocr-workers", type=int, help="processos de OCR (padrão: número de CPUs)")
+    arg_parser.add_argument("--google-calendar", action="store_true", help="habilita POST /sync")
+    args = arg_parser.parse_args()
+
+    from main import CalendarGenerator
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    google_generator = CalendarGenerator(use_google_calendar=True, event_log_every=0) if args.google_calendar else None
+    app = create_app(google_generator=google_generator, max_concurrency=args.concurrency, ocr_workers=args.ocr_workers)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
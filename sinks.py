@@ -0,0 +1,356 @@
+import csv
+import json
+import os
+import queue
+import time
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from export_cache import safe_class_id
+from metrics import metrics, bulk_logging, event_log
+from schedule import Schedule
+
+logger = logging.getLogger(__name__)
+
+# Horários aguardando em cada saída antes de quem envia ter que esperar (backpressure por saída)
+SINK_QUEUE_SIZE = 32
+
+_STOP = object()
+
+
+def _file_stem(class_id: Optional[str]) -> str:
+    return f"horario_{safe_class_id(class_id)}" if class_id else "horario"
+
+
+class Sink(ABC):
+    """
+    Saída do exportador: recebe o horário já compilado e devolve uma descrição do resultado
+    """
+
+    name = "sink"
+
+    @abstractmethod
+    def write(self, schedule: Schedule, compiled: List[Dict], end_date: str) -> str:
+        ...
+
+    def close(self):
+        pass
+
+
+class IcsSink(Sink):
+    """
+    Arquivo .ics (com o cache por conteúdo do gerador)
+    """
+
+    name = "ics"
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def write(self, schedule: Schedule, compiled: List[Dict], end_date: str) -> str:
+        return self.generator.export_ics(schedule, end_date, compiled=compiled).path
+
+
+class GoogleSink(Sink):
+    """
+    Eventos no Google Calendar (job retomável do gerador)
+    """
+
+    name = "google"
+
+    def __init__(self, generator):
+        if generator.google_manager is None:
+            raise ValueError("Google Calendar Manager não está inicializado.")
+        self.generator = generator
+
+    def write(self, schedule: Schedule, compiled: List[Dict], end_date: str) -> str:
+        summary = self.generator.create_google_calendar_events(
+            schedule, end_date, class_id=schedule.class_id, compiled=compiled
+        )
+        return f"{summary['created']} eventos criados, {summary['skipped']} já existentes"
+
+
+class JsonSink(Sink):
+    """
+    Eventos compilados em JSON, um arquivo por turma
+
+    O arquivo é gravado em um temporário e trocado de uma vez, então quem lê nunca vê um
+    JSON pela metade, nem quando duas exportações gravam a mesma turma.
+    """
+
+    name = "json"
+
+    def __init__(self, directory: str = "output"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, schedule: Schedule, compiled: List[Dict], end_date: str) -> str:
+        payload = {
+            "turma": schedule.class_id,
+            "data_final": end_date,
+            "eventos": [
+                {
+                    "materia": event["materia"],
+                    "dia_semana": event["dia_semana"],
+                    "aula": event["slot"],
+                    "aulas": event["slot_count"],
+                    "inicio": event["start"].isoformat(),
+                    "fim": event["end"].isoformat(),
+                    "rrule": event["rrule"],
+                    "exdates": [d.isoformat() for d in event["exdates"]],
+                }
+                for event in compiled
+            ],
+        }
+        path = self.directory / f"{_file_stem(schedule.class_id)}.json"
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return str(path)
+
+
+class CsvSink(Sink):
+    """
+    Eventos compilados em uma planilha CSV por exportação, uma linha por evento
+
+    O nome do arquivo leva a data e hora da exportação, então uma exportação nunca
+    sobrescreve a planilha de outra (anterior ou simultânea).
+    """
+
+    name = "csv"
+
+    HEADER = ["turma", "dia_semana", "aula", "aulas", "materia", "inicio", "fim", "rrule", "exdates"]
+
+    def __init__(self, directory: str = "output"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path: Optional[Path] = None
+        self._file = None
+        self._writer = None
+
+    def write(self, schedule: Schedule, compiled: List[Dict], end_date: str) -> str:
+        if self._writer is None:
+            self.path = self.directory / f"horarios_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.csv"
+            self._file = open(self.path, 'x', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.HEADER)
+        for event in compiled:
+            self._writer.writerow([
+                schedule.class_id or "",
+                event["dia_semana"],
+                event["slot"],
+                event["slot_count"],
+                event["materia"],
+                event["start"].isoformat(),
+                event["end"].isoformat(),
+                event["rrule"],
+                ",".join(d.isoformat() for d in event["exdates"]),
+            ])
+        return str(self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = self._writer = None
+
+
+class FeedSink(Sink):
+    """
+    Horário guardado no FeedStore, para ser servido como feed .ics
+    """
+
+    name = "feed"
+
+    def __init__(self, store):
+        self.store = store
+
+    def write(self, schedule: Schedule, compiled: List[Dict], end_date: str) -> str:
+        self.store.put(schedule, end_date)
+        return f"feed {schedule.class_id}"
+
+
+class SinkStats(NamedTuple):
+    """
+    Resultado de uma saída: itens gravados, erros, tempo gasto e o resultado de cada turma
+    """
+    name: str
+    items: int
+    errors: int
+    seconds: float
+    results: List[tuple]
+    last_error: Optional[str]
+
+
+class ExportReport:
+    """
+    Relatório por saída de uma exportação
+    """
+
+    def __init__(self, stats: List[SinkStats], seconds: float):
+        self.stats = {s.name: s for s in stats}
+        self.seconds = seconds
+
+    @property
+    def ok(self) -> bool:
+        return all(s.errors == 0 for s in self.stats.values())
+
+    def result(self, sink: str) -> Optional[str]:
+        """
+        Resultado da última turma gravada pela saída informada
+        """
+        results = self.stats[sink].results
+        return results[-1][1] if results else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "seconds": self.seconds,
+            "sinks": {
+                name: {"items": s.items, "errors": s.errors, "seconds": s.seconds, "last_error": s.last_error}
+                for name, s in self.stats.items()
+            },
+        }
+
+    def summary(self) -> str:
+        lines = [f"Exportação em {self.seconds:.2f}s"]
+        for s in self.stats.values():
+            status = f"{s.errors} erros ({s.last_error})" if s.errors else "ok"
+            lines.append(f"  {s.name}: {s.items} turmas em {s.seconds:.2f}s - {status}")
+        return "\n".join(lines)
+
+
+class _SinkWorker:
+    """
+    Thread de uma saída, com fila própria e limitada
+
+    A thread usa a amostragem de logs por evento de quem criou o pipeline. Com completed,
+    cada turma gravada (ou com erro) é avisada nessa fila como (turma, resultado, erro).
+    """
+
+    def __init__(self, sink: Sink, queue_size: int, completed: Optional["queue.Queue"] = None):
+        self.sink = sink
+        self.completed = completed
+        self.sample_every = event_log.sample_every
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.items = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.results: List[tuple] = []
+        self.last_error: Optional[str] = None
+        self.thread = threading.Thread(target=self._run, name=f"sink-{sink.name}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        with bulk_logging(self.sample_every):
+            self._consume()
+
+    def _consume(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            schedule, compiled, end_date = item
+            start = time.perf_counter()
+            try:
+                result = self.sink.write(schedule, compiled, end_date)
+                self.items += 1
+                self.results.append((schedule.class_id, result))
+                if self.completed is not None:
+                    self.completed.put((schedule.class_id, result, None))
+            except Exception as e:
+                # O erro fica nesta saída; as outras continuam
+                self.errors += 1
+                self.last_error = str(e)
+                metrics.inc("sink_errors", sink=self.sink.name)
+                logger.error(f"Erro na saída {self.sink.name} (turma {schedule.class_id}): {e}")
+                if self.completed is not None:
+                    self.completed.put((schedule.class_id, None, str(e)))
+            finally:
+                elapsed = time.perf_counter() - start
+                self.seconds += elapsed
+                metrics.observe("sink_write", elapsed, sink=self.sink.name)
+        try:
+            self.sink.close()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            logger.error(f"Erro ao fechar a saída {self.sink.name}: {e}")
+
+    def stats(self) -> SinkStats:
+        return SinkStats(self.sink.name, self.items, self.errors, self.seconds, self.results, self.last_error)
+
+
+class ExportPipeline:
+    """
+    Distribui cada horário compilado uma única vez para várias saídas que rodam em paralelo
+
+    Cada saída tem sua thread e sua fila limitada: uma saída lenta (Google) só segura quem envia
+    quando a fila dela enche, e um erro em uma saída não afeta as outras. Com completed, os
+    resultados da primeira saída são avisados nessa fila assim que cada turma fica pronta.
+    """
+
+    def __init__(self, sinks: Iterable[Sink], queue_size: int = SINK_QUEUE_SIZE,
+                 completed: Optional["queue.Queue"] = None):
+        self._start = time.perf_counter()
+        self._workers = [
+            _SinkWorker(sink, queue_size, completed if i == 0 else None) for i, sink in enumerate(sinks)
+        ]
+        self._closed = False
+
+    def submit(self, schedule: Schedule, compiled: List[Dict], end_date: str):
+        for worker in self._workers:
+            worker.queue.put((schedule, compiled, end_date))
+
+    def close(self) -> ExportReport:
+        """
+        Espera as saídas terminarem e devolve o relatório
+        """
+        if not self._closed:
+            self._closed = True
+            for worker in self._workers:
+                worker.queue.put(_STOP)
+            for worker in self._workers:
+                worker.thread.join()
+        report = ExportReport([w.stats() for w in self._workers], time.perf_counter() - self._start)
+        logger.info(f"Exportação para {len(self._workers)} saídas concluída em {report.seconds:.2f}s")
+        return report
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def make_sinks(names: Iterable[str], generator, feed_store=None) -> List[Sink]:
+    """
+    Cria as saídas pelos nomes: "ics", "google", "json", "csv" e "feed"
+    """
+    sinks = []
+    for name in names:
+        if name == "ics":
+            sinks.append(IcsSink(generator))
+        elif name == "google":
+            sinks.append(GoogleSink(generator))
+        elif name == "json":
+            sinks.append(JsonSink(generator.output_dir))
+        elif name == "csv":
+            sinks.append(CsvSink(generator.output_dir))
+        elif name == "feed":
+            if feed_store is None:
+                from feed_server import FeedStore
+                feed_store = FeedStore()
+            sinks.append(FeedSink(feed_store))
+        else:
+            raise ValueError(f"Saída desconhecida: {name}")
+    return sinks
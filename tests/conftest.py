@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório e são importados pelo nome
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Roda o teste em uma pasta vazia (output/, calendar_jobs.json e feeds/ são relativos à pasta atual)
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,70 @@
+from PIL import Image
+
+import adaptive_ocr
+from adaptive_ocr import FAST_CONFIG, AdaptiveOcr
+
+
+def data(*words):
+    """
+    Saída de image_to_data (Output.DICT) com uma palavra por linha: (texto, confiança, esquerda, topo)
+    """
+    result = {key: [] for key in ("text", "conf", "left", "top", "width", "height", "block_num", "par_num", "line_num")}
+    for line, (text, conf, left, top) in enumerate(words, start=1):
+        for key, value in zip(result, (text, conf, left, top, 80, 20, 1, 1, line)):
+            result[key].append(value)
+    return result
+
+
+def fake_tesseract(monkeypatch, first_pass, retries):
+    calls = []
+
+    def image_to_data(image, lang, config, output_type):
+        calls.append((config, image.size))
+        if config == FAST_CONFIG:
+            return first_pass
+        return retries.pop(0)
+
+    monkeypatch.setattr(adaptive_ocr.pytesseract, "image_to_data", image_to_data)
+    return calls
+
+
+def test_only_low_confidence_lines_are_retried(monkeypatch):
+    calls = fake_tesseract(
+        monkeypatch,
+        data(("Matemática", 95, 10, 10), ("Portugu3s", 40, 10, 50)),
+        [data(("Portugues", 55, 6, 6)), data(("Português", 92, 12, 12))],
+    )
+
+    result = AdaptiveOcr().read(Image.new("L", (200, 100), 255))
+
+    assert result.text == "Matemática\nPortuguês"
+    assert (result.retried, result.improved) == (1, 1)
+    assert result.lines[1].retried and result.lines[1].conf == 92
+    # A segunda releitura usa o recorte ampliado 2x; a caixa volta para as coordenadas da imagem original
+    assert [config for config, _ in calls] == [FAST_CONFIG, "--oem 3 --psm 7", "--oem 3 --psm 7"]
+    assert calls[2][1] == (2 * calls[1][1][0], 2 * calls[1][1][1])
+    assert result.lines[1].words[0].left == 4 + 12 // 2
+
+
+def test_worse_retry_keeps_first_pass(monkeypatch):
+    fake_tesseract(
+        monkeypatch,
+        data(("Arte", 60, 10, 10)),
+        [data(("Arle", 30, 6, 6)), data(), data(("Ar", 50, 6, 6))],
+    )
+
+    result = AdaptiveOcr().read(Image.new("L", (200, 100), 255))
+
+    assert result.text == "Arte"
+    assert (result.retried, result.improved) == (1, 0)
+    assert not result.lines[0].retried
+
+
+def test_no_retries_without_time_budget(monkeypatch):
+    calls = fake_tesseract(monkeypatch, data(("Arle", 30, 10, 10)), [])
+
+    result = AdaptiveOcr(time_budget=0).read(Image.new("L", (200, 100), 255))
+
+    assert result.text == "Arle"
+    assert result.retried == 0
+    assert len(calls) == 1
@@ -0,0 +1,60 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from holiday_calendar import HolidayCalendar
+from main import CalendarGenerator
+
+END_DATE = (date.today() + timedelta(days=120)).isoformat()
+
+
+@pytest.fixture
+def make_generator(workdir):
+    def make(**options):
+        options.setdefault("holidays", HolidayCalendar())
+        return CalendarGenerator(**options)
+    return make
+
+
+def blocks(events):
+    return [(event["dia_semana"], event["slot"], event["slot_count"], event["materia"]) for event in events]
+
+
+def test_consecutive_slots_merge_until_the_break(make_generator):
+    generator = make_generator()
+    events = generator.compile_events({"segunda": ["Matemática"] * 5}, END_DATE)
+
+    assert blocks(events) == [("segunda", 1, 3, "Matemática"), ("segunda", 4, 2, "Matemática")]
+    assert (events[0]["start"].time().isoformat(), events[0]["end"].time().isoformat()) == ("07:30:00", "09:45:00")
+
+
+def test_different_subjects_are_not_merged(make_generator):
+    generator = make_generator()
+    events = generator.compile_events({"terça": ["Arte", "Física", "Física", "Arte"]}, END_DATE)
+
+    assert blocks(events) == [("terça", 1, 1, "Arte"), ("terça", 2, 2, "Física"), ("terça", 4, 1, "Arte")]
+
+
+@pytest.mark.parametrize("options", [{"merge_slots": False}, {"merge_max_gap": 0}])
+def test_merging_can_be_disabled(make_generator, options):
+    generator = make_generator(**options)
+    events = generator.compile_events({"quarta": ["Química", "Química", "Química"]}, END_DATE)
+
+    assert blocks(events) == [("quarta", slot, 1, "Química") for slot in (1, 2, 3)]
+
+
+def test_holidays_become_exdates_and_recesses_split_the_rule(make_generator):
+    today = date.today()
+    holiday = today + timedelta(days=14 + (0 - today.weekday()) % 7)
+    recess = (today + timedelta(days=40), today + timedelta(days=54))
+    generator = make_generator(holidays=HolidayCalendar([holiday], [recess]))
+
+    events = generator.compile_events({"segunda": ["Arte"]}, END_DATE)
+
+    before, after = events
+    assert [event["segment"] for event in events] == [0, 1]
+    assert before["rrule"] == f"FREQ=WEEKLY;UNTIL={(recess[0] - timedelta(days=1)).strftime('%Y%m%d')}T235959Z"
+    assert before["exdates"] == [datetime.combine(holiday, time(7, 30))]
+    assert after["start"].date() > recess[1]
+    assert after["start"].weekday() == 0
+    assert after["exdates"] == []
@@ -0,0 +1,28 @@
+import pytest
+
+import documents
+from documents import detect_class_id, iter_document_schedules
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Turma: 6º A\nSegunda", "6º A"),
+    ("TURMA 7B", "7B"),
+    ("Classe - 801", "801"),
+    ("Turma B", "B"),
+    ("Horário das turmas", None),
+    ("Quadro de turmas\nSegunda", None),
+    ("Turma Matutina", None),
+])
+def test_detect_class_id(text, expected):
+    assert detect_class_id(text) == expected
+
+
+def test_document_without_pages_yields_nothing(monkeypatch):
+    monkeypatch.setattr(documents, "page_count", lambda path: 0)
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("pool criado para um documento vazio")
+
+    monkeypatch.setattr(documents, "ProcessPoolExecutor", no_pool)
+
+    assert list(iter_document_schedules("vazio.pdf")) == []
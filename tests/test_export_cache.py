@@ -0,0 +1,72 @@
+import os
+import time
+from datetime import date, timedelta
+
+import main
+from export_cache import ExportCache
+from main import CalendarGenerator
+
+
+def _key(i: int) -> str:
+    return f"{i:016x}" * 4
+
+
+def test_put_never_evicts_files_of_the_current_run(tmp_path):
+    cache = ExportCache(tmp_path, max_files=5)
+    paths = [cache.put(_key(i), f"conteudo {i}").path for i in range(12)]
+
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_file_limit_is_applied_between_runs(tmp_path):
+    first_run = ExportCache(tmp_path, max_files=5)
+    paths = []
+    for i in range(8):
+        paths.append(first_run.put(_key(i), f"conteudo {i}").path)
+        # mtime distinto para a ordem de remoção ser determinística
+        os.utime(paths[-1], (time.time() - 100 + i, time.time() - 100 + i))
+
+    ExportCache(tmp_path, max_files=5)
+
+    remaining = sorted(str(p) for p in tmp_path.glob("*.ics"))
+    assert remaining == sorted(paths[3:])
+
+
+def test_put_removes_expired_files(tmp_path):
+    cache = ExportCache(tmp_path, max_files=100, max_age_days=1)
+    old = cache.put(_key(1), "antigo").path
+    os.utime(old, (time.time() - 3 * 86400, time.time() - 3 * 86400))
+
+    new = cache.put(_key(2), "novo").path
+
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+
+
+def test_cache_hit_reuses_file(tmp_path):
+    cache = ExportCache(tmp_path)
+    written = cache.put(_key(1), "conteudo")
+    hit = cache.get(_key(1))
+
+    assert not written.cached
+    assert hit.cached
+    assert hit.path == written.path
+    assert hit.etag == written.etag
+
+
+def test_same_schedule_hits_cache_on_another_day(workdir, monkeypatch):
+    generator = CalendarGenerator()
+    horario = {"segunda": ["Matemática", "Português"], "quarta": ["Arte"]}
+    end_date = (date.today() + timedelta(days=120)).isoformat()
+    first = generator.export_ics(horario, end_date)
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    monkeypatch.setattr(main, "date", Tomorrow)
+    second = generator.export_ics(horario, end_date)
+
+    assert second.cached
+    assert (second.path, second.etag) == (first.path, first.etag)
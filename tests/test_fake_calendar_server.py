@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from fake_calendar_server import FakeCalendarBackend, FakeCalendarServer
+from google_calendar_manager import BATCH_SIZE, GoogleCalendarManager
+
+START = datetime.fromisoformat("2026-03-02T07:00:00-03:00")
+END = datetime.fromisoformat("2026-03-02T07:50:00-03:00")
+
+
+def test_manager_pages_and_batches_over_http(tmp_path):
+    backend = FakeCalendarBackend(page_size=7)
+    total = BATCH_SIZE + 10
+
+    with FakeCalendarServer(backend=backend) as server:
+        manager = GoogleCalendarManager(sync_state_file=str(tmp_path / "sync.json"), base_url=server.url)
+        for i in range(total):
+            manager.create_event(f"Aula {i}", START, END, "segunda", class_id="6A", slot=i)
+        backend.calls.clear()
+
+        listed = manager.list_school_events(class_id="6A")
+        list_calls = backend.calls["list"]
+        deleted = manager.delete_all_school_events(class_id="6A")
+
+        remaining = manager.list_school_events(class_id="6A")
+
+    assert len({event["id"] for event in listed}) == total
+    assert list_calls == -(-total // 7)
+    assert deleted == total
+    assert backend.calls["delete"] == total
+    assert remaining == []
+
+
+def test_server_reports_api_errors_per_batch_item(tmp_path):
+    backend = FakeCalendarBackend()
+
+    with FakeCalendarServer(backend=backend) as server:
+        manager = GoogleCalendarManager(sync_state_file=str(tmp_path / "sync.json"), base_url=server.url)
+        event_id = manager.create_event("Arte", START, END, "segunda", class_id="6A")
+        requests = [
+            manager._events().delete(calendarId=manager.calendar_id, eventId=event_id),
+            manager._events().delete(calendarId=manager.calendar_id, eventId="inexistente"),
+        ]
+        (_, first_error), (_, second_error) = manager._execute_batch("delete", requests)
+
+    assert first_error is None
+    assert second_error.resp.status == 404
+    assert backend.calls["delete"] == 2
@@ -0,0 +1,69 @@
+import gzip
+import urllib.error
+import urllib.request
+from datetime import date, timedelta
+
+import pytest
+
+from export_cache import etag_matches
+from feed_server import FeedServer, FeedStore
+from schedule import Schedule
+
+HORARIO = {"segunda": ["Matemática", "Matemática", "Português"], "terça": ["Arte"]}
+END_DATE = (date.today() + timedelta(days=120)).isoformat()
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", W/"abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ('"abc-gz"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+def _get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_feed_server_answers_304_for_known_etag(workdir):
+    store = FeedStore(workdir / "feeds")
+    store.put(Schedule.from_dict(HORARIO, class_id="6A"), END_DATE)
+
+    with FeedServer(store) as server:
+        status, headers, body = _get(server.feed_url("6A"))
+        etag = headers["ETag"]
+        not_modified = _get(server.feed_url("6A"), {"If-None-Match": f"W/{etag}"})
+
+    assert status == 200
+    assert body.startswith(b"BEGIN:VCALENDAR")
+    assert not_modified[0] == 304
+    assert not_modified[2] == b""
+
+
+def test_gzip_and_identity_bodies_have_distinct_etags(workdir):
+    store = FeedStore(workdir / "feeds")
+    store.put(Schedule.from_dict(HORARIO, class_id="6A"), END_DATE)
+
+    with FeedServer(store) as server:
+        _, plain, _ = _get(server.feed_url("6A"))
+        _, gzipped, body = _get(server.feed_url("6A"), {"Accept-Encoding": "gzip"})
+        # O ETag do corpo em texto puro não valida a versão em gzip
+        cross = _get(server.feed_url("6A"), {"Accept-Encoding": "gzip", "If-None-Match": plain["ETag"]})
+        same = _get(server.feed_url("6A"), {"Accept-Encoding": "gzip", "If-None-Match": gzipped["ETag"]})
+
+    assert gzipped["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body).startswith(b"BEGIN:VCALENDAR")
+    assert plain["ETag"] != gzipped["ETag"]
+    assert plain["Vary"] == gzipped["Vary"] == "Accept-Encoding"
+    assert cross[0] == 200
+    assert same[0] == 304
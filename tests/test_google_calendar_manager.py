@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+
+from fake_calendar_server import FakeCalendarService
+from google_calendar_manager import GoogleCalendarManager
+
+START = "2026-03-02T07:00:00-03:00"
+END = "2026-03-02T07:50:00-03:00"
+
+
+def make_manager(tmp_path, service=None):
+    manager = GoogleCalendarManager(sync_state_file=str(tmp_path / "sync.json"))
+    manager.service = service or FakeCalendarService()
+    return manager
+
+
+def add_event(manager, summary):
+    return manager.service.events().insert(calendarId=manager.calendar_id, body={
+        "summary": summary,
+        "start": {"dateTime": START},
+        "end": {"dateTime": END},
+    }).execute()
+
+
+def test_incremental_sync_fetches_only_changes(tmp_path):
+    manager = make_manager(tmp_path)
+    first = add_event(manager, "Arte")
+    manager.sync_events()
+
+    second = add_event(manager, "Física")
+    manager.service.events().delete(calendarId=manager.calendar_id, eventId=first["id"]).execute()
+    mirror = manager.sync_events()
+
+    assert sorted(mirror) == [second["id"]]
+    saved = json.loads((tmp_path / "sync.json").read_text(encoding="utf-8"))
+    assert sorted(saved[manager.calendar_id]["events"]) == [second["id"]]
+
+
+def test_sync_without_changes_does_not_rewrite_state(tmp_path):
+    manager = make_manager(tmp_path)
+    add_event(manager, "Arte")
+    manager.sync_events()
+    state_file = tmp_path / "sync.json"
+    state_file.write_text("{}", encoding="utf-8")
+
+    manager.sync_events()
+
+    assert state_file.read_text(encoding="utf-8") == "{}"
+
+
+def test_expired_token_triggers_full_resync(tmp_path):
+    service = FakeCalendarService()
+    manager = make_manager(tmp_path, service)
+    add_event(manager, "Arte")
+    manager.sync_events()
+    # Estado de outra execução com um evento que já não existe
+    manager._load_sync_state()[manager.calendar_id]["events"]["fantasma"] = {"id": "fantasma"}
+    service.backend.expire_sync_tokens()
+    service.calls.clear()
+
+    mirror = manager.sync_events()
+
+    assert "fantasma" not in mirror
+    assert [event["summary"] for event in mirror.values()] == ["Arte"]
+    assert service.calls["list"] == 2
+
+
+def test_school_events_are_filtered_by_private_properties(tmp_path):
+    manager = make_manager(tmp_path)
+    other_run = GoogleCalendarManager(run_id="outra", sync_state_file=str(tmp_path / "sync.json"))
+    other_run.service = manager.service
+    start, end = datetime.fromisoformat(START), datetime.fromisoformat(END)
+    manager.create_event("Arte", start, end, "Segunda", class_id="6A")
+    manager.create_event("Física", start, end, "terça", class_id="6A")
+    manager.create_event("Química", start, end, "segunda", class_id="7B")
+    other_run.create_event("Inglês", start, end, "segunda", class_id="6A")
+    add_event(manager, "Reunião de pais")
+
+    def summaries(**filters):
+        return sorted(event["summary"] for event in manager.list_school_events(**filters))
+
+    assert summaries() == ["Arte", "Física", "Inglês", "Química"]
+    assert summaries(class_id="6A") == ["Arte", "Física", "Inglês"]
+    assert summaries(class_id="6A", dia_semana="segunda") == ["Arte", "Inglês"]
+    assert summaries(class_id="6A", run_id="outra") == ["Inglês"]
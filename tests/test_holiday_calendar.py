@@ -0,0 +1,43 @@
+from datetime import date
+
+from holiday_calendar import HolidayCalendar
+
+
+def test_lines_with_holidays_and_ranges():
+    calendar = HolidayCalendar.from_lines([
+        "# feriados de 2026",
+        "2026-04-03;Sexta-feira Santa",
+        "20/04/2026..21/04/2026, emenda de Tiradentes",
+        "13/07/2026..24/07/2026;Recesso de julho",
+        "",
+    ])
+
+    assert calendar.holidays == [date(2026, 4, 3), date(2026, 4, 20), date(2026, 4, 21)]
+    assert calendar.recesses == [(date(2026, 7, 13), date(2026, 7, 24))]
+
+
+def test_recess_splits_the_term():
+    calendar = HolidayCalendar(ranges=[(date(2026, 7, 13), date(2026, 7, 24))])
+
+    term = calendar.term(date(2026, 6, 1), date(2026, 8, 31))
+
+    assert term.segments == [(date(2026, 6, 1), date(2026, 7, 12)), (date(2026, 7, 25), date(2026, 8, 31))]
+
+
+def test_recess_at_the_start_truncates_the_term():
+    calendar = HolidayCalendar(ranges=[(date(2026, 7, 1), date(2026, 7, 24))])
+
+    term = calendar.term(date(2026, 7, 10), date(2026, 8, 31))
+
+    assert term.segments == [(date(2026, 7, 25), date(2026, 8, 31))]
+
+
+def test_exdates_by_weekday_and_period():
+    calendar = HolidayCalendar([date(2026, 4, 3), date(2026, 4, 10), date(2026, 9, 7), date(2026, 4, 21)])
+
+    term = calendar.term(date(2026, 3, 1), date(2026, 6, 30))
+
+    # Sextas de abril dentro do trecho; 07/09 fica fora do período
+    assert term.exdates(4, date(2026, 3, 1), date(2026, 6, 30)) == [date(2026, 4, 3), date(2026, 4, 10)]
+    assert term.exdates(4, date(2026, 4, 4), date(2026, 6, 30)) == [date(2026, 4, 10)]
+    assert term.exdates(1, date(2026, 3, 1), date(2026, 6, 30)) == [date(2026, 4, 21)]
@@ -0,0 +1,60 @@
+from ingest import iter_rows, iter_schedules
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_semicolon_csv_with_short_row(tmp_path):
+    path = write(tmp_path / "horarios.csv",
+                 "turma;dia;1;2;3;4;5\n"
+                 "6A;segunda;Matemática;Português;Arte;História;Física\n"
+                 "6A;terça\n"
+                 "6A;quarta;Arte\n")
+
+    (schedule,) = iter_schedules(path)
+
+    assert schedule.class_id == "6A"
+    assert schedule["segunda"] == ["Matemática", "Português", "Arte", "História", "Física"]
+    assert schedule["quarta"][0] == "Arte"
+
+
+def test_ragged_rows_are_skipped(tmp_path, caplog):
+    path = write(tmp_path / "horarios.csv",
+                 "turma,dia,aula,materia\n"
+                 "7B,segunda,1,Arte\n"
+                 "7B,terça\n"
+                 "7B\n"
+                 "7B,quarta,2,Química\n")
+
+    (schedule,) = iter_schedules(path)
+
+    assert schedule["segunda"][0] == "Arte"
+    assert schedule["quarta"][1] == "Química"
+    assert "linha ignorada" in caplog.text
+
+
+def test_tab_delimiter_detected_from_header(tmp_path):
+    path = write(tmp_path / "horarios.tsv", "turma\tdia\t1\n8C\tsexta\tInglês, turma B\n")
+
+    assert list(iter_rows(path)) == [["turma", "dia", "1"], ["8C", "sexta", "Inglês, turma B"]]
+
+
+def test_explicit_delimiter(tmp_path):
+    path = write(tmp_path / "horarios.csv", "turma|dia|1\n9A|segunda|Arte\n")
+
+    (schedule,) = iter_schedules(path, delimiter="|")
+
+    assert schedule.class_id == "9A"
+    assert schedule["segunda"][0] == "Arte"
+
+
+def test_spreadsheet_subjects_are_not_truncated(tmp_path):
+    path = write(tmp_path / "horarios.csv",
+                 "turma,dia,1,2,3,4\n"
+                 "6A,segunda,Educação Física,Ed. Física,Geometria,matematica\n")
+
+    (schedule,) = iter_schedules(path)
+
+    assert schedule["segunda"][:4] == ["Educação Física", "Educação Física", "Geometria", "Matemática"]
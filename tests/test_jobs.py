@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+
+import pytest
+
+import main
+from fake_calendar_server import FakeCalendarService
+from main import CalendarGenerator
+from schedule import Schedule
+
+HORARIO_A = {dia: ["Matemática", "Português", "História", "Arte", "Física"]
+             for dia in ["segunda", "terça", "quarta", "quinta", "sexta"]}
+HORARIO_B = {dia: ["Química", "Português", "História", "Arte", "Física"]
+             for dia in ["segunda", "terça", "quarta", "quinta", "sexta"]}
+# Relativa a hoje: com uma data fixa, os testes param de gerar eventos quando ela passa
+END_DATE = (date.today() + timedelta(days=120)).isoformat()
+
+
+@pytest.fixture
+def generator(workdir):
+    generator = CalendarGenerator(sinks=["google"])
+    generator.google_manager.service = FakeCalendarService()
+    return generator
+
+
+def sync(generator, horario, class_id="6A"):
+    schedule = Schedule.from_dict(horario, class_id=class_id)
+    return generator.create_google_calendar_events(schedule, END_DATE, class_id=class_id)
+
+
+def subjects(generator, class_id="6A"):
+    return sorted({event["summary"] for event in generator.google_manager.list_school_events(class_id=class_id)})
+
+
+def test_rerun_of_finished_job_only_lists(generator):
+    first = sync(generator, HORARIO_A)
+    calls = generator.google_manager.service.calls
+    calls.clear()
+
+    second = sync(generator, HORARIO_A)
+
+    assert first["created"] == 25
+    assert second == {"created": 0, "skipped": 25}
+    assert dict(calls) == {"list": 1}
+
+
+def test_failed_job_resumes_without_duplicates(generator, monkeypatch):
+    manager = generator.google_manager
+    create_event = manager.create_event
+    attempts = []
+
+    def flaky_create_event(**kwargs):
+        attempts.append(kwargs["event_id"])
+        if len(attempts) == 10:
+            raise RuntimeError("quota excedida")
+        return create_event(**kwargs)
+
+    monkeypatch.setattr(manager, "create_event", flaky_create_event)
+    with pytest.raises(RuntimeError):
+        sync(generator, HORARIO_A)
+    monkeypatch.setattr(manager, "create_event", create_event)
+
+    summary = sync(generator, HORARIO_A)
+
+    assert summary == {"created": 16, "skipped": 9}
+    assert len(manager.list_school_events(class_id="6A")) == 25
+
+
+def test_conflict_with_existing_event_counts_as_created(generator):
+    sync(generator, HORARIO_A)
+    # Checkpoint perdido: os eventos continuam no calendário
+    generator.job_runner._state = {}
+
+    summary = sync(generator, HORARIO_A)
+
+    assert summary["created"] == 25
+    assert len(generator.google_manager.list_school_events(class_id="6A")) == 25
+
+
+def test_deleted_events_are_recreated_with_new_ids(generator):
+    sync(generator, HORARIO_A)
+    generator.google_manager.delete_all_school_events(class_id="6A")
+
+    summary = sync(generator, HORARIO_A)
+
+    assert summary["created"] == 25
+    assert subjects(generator) == ["Arte", "Física", "História", "Matemática", "Português"]
+
+
+def test_conflict_with_deleted_event_moves_to_next_generation(generator):
+    sync(generator, HORARIO_A)
+    generator.google_manager.delete_all_school_events(class_id="6A")
+    # Checkpoint perdido depois da exclusão: os IDs antigos respondem 409 como eventos apagados
+    generator.job_runner._state = {}
+
+    summary = sync(generator, HORARIO_A)
+
+    assert summary["created"] == 25
+    assert len(generator.google_manager.list_school_events(class_id="6A")) == 25
+
+
+def test_schedule_change_and_revert_leaves_only_current_events(generator):
+    sync(generator, HORARIO_A)
+    sync(generator, HORARIO_B)
+    summary = sync(generator, HORARIO_A)
+
+    assert summary["created"] == 25
+    assert subjects(generator) == ["Arte", "Física", "História", "Matemática", "Português"]
+    assert len(generator.google_manager.list_school_events(class_id="6A")) == 25
+
+
+def test_failed_job_resumes_on_the_next_day(generator, monkeypatch):
+    manager = generator.google_manager
+    create_event = manager.create_event
+    attempts = []
+
+    def flaky_create_event(**kwargs):
+        attempts.append(kwargs["event_id"])
+        if len(attempts) == 20:
+            raise RuntimeError("quota diária excedida")
+        return create_event(**kwargs)
+
+    monkeypatch.setattr(manager, "create_event", flaky_create_event)
+    with pytest.raises(RuntimeError):
+        sync(generator, HORARIO_A)
+    monkeypatch.setattr(manager, "create_event", create_event)
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    monkeypatch.setattr(main, "date", Tomorrow)
+    manager.service.calls.clear()
+    summary = sync(generator, HORARIO_A)
+
+    assert summary == {"created": 6, "skipped": 19}
+    assert "delete" not in manager.service.calls
+    assert len(manager.list_school_events(class_id="6A")) == 25
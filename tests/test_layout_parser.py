@@ -0,0 +1,61 @@
+from adaptive_ocr import OcrWord
+from layout_parser import LayoutParser
+from parser import ScheduleParser
+
+HEIGHT = 20
+
+
+def word(text, left, top, conf=90.0):
+    return OcrWord(text, conf, left, top, 10 * len(text), HEIGHT, 1, 1, 1)
+
+
+def grid(rows, day_positions, label_left=0):
+    """
+    Palavras de uma tabela: rows é uma lista de (topo, rótulo, [célula de cada coluna])
+    """
+    words = []
+    for top, label, cells in rows:
+        if label:
+            words.append(word(label, label_left, top))
+        for left, text in zip(day_positions, cells):
+            if text:
+                words.append(word(text, left, top))
+    return words
+
+
+def test_one_day_per_column():
+    columns = [100, 300, 500]
+    words = grid([
+        (10, "Horário", ["Segunda", "Terça", "Quarta"]),
+        (50, "07:30", ["Matemática", "Arte", "Física"]),
+        (90, "08:16", ["Matemática", "", "Química"]),
+        (130, "", ["Recreio", "Recreio", "Recreio"]),
+        (170, "10:01", ["Portugues", "História", "Arte"]),
+    ], columns)
+
+    result = LayoutParser(ScheduleParser()).parse(words, class_id="6A")
+
+    assert result.orientation == "colunas"
+    assert result.schedule.class_id == "6A"
+    assert result.schedule["segunda"][:3] == ["Matemática", "Matemática", "Português"]
+    assert result.schedule["terça"][:3] == ["Arte", "???", "História"]
+    assert result.schedule["quarta"][:3] == ["Física", "Química", "Arte"]
+    assert len(result.cells) == 8
+
+
+def test_one_day_per_row():
+    words = [word("Segunda", 0, 10), word("Terça", 0, 60)]
+    words += [word("Arte", 150, 10), word("Física", 300, 10), word("Química", 150, 60), word("Arte", 300, 60)]
+
+    result = LayoutParser(ScheduleParser()).parse(words)
+
+    assert result.orientation == "linhas"
+    assert result.schedule["segunda"][:2] == ["Arte", "Física"]
+    assert result.schedule["terça"][:2] == ["Química", "Arte"]
+
+
+def test_without_day_header_returns_none():
+    words = [word("Matemática", 10, 10), word("Segunda", 200, 10), word("Arte", 10, 50)]
+
+    assert LayoutParser(ScheduleParser()).parse(words) is None
+    assert LayoutParser(ScheduleParser()).parse([]) is None
@@ -0,0 +1,19 @@
+from metrics import profile_job
+
+
+def test_unknown_profiler_runs_job_without_profile(workdir, caplog):
+    ran = []
+    with profile_job("importacao", backend="yappi"):
+        ran.append(True)
+
+    assert ran == [True]
+    assert "Perfilador desconhecido: yappi" in caplog.text
+    assert not (workdir / "profiles").exists()
+
+
+def test_cprofile_saves_profile(workdir):
+    with profile_job("importacao", backend="cprofile"):
+        sum(range(1000))
+
+    (profile,) = (workdir / "profiles").glob("importacao_*.prof")
+    assert profile.stat().st_size > 0
@@ -0,0 +1,61 @@
+import pytest
+
+import schedule as schedule_module
+from schedule import MATERIA_VAZIA, Schedule, SubjectTable, default_subjects
+
+HORARIO = {
+    "segunda": ["Matemática", "Matemática", "", "Educação Física"],
+    "quarta": ["Português", MATERIA_VAZIA, "Arte"],
+    "sexta": ["Química"],
+}
+
+
+def test_bytes_round_trip():
+    original = Schedule.from_dict(HORARIO, class_id="6º A", slots_per_day=6)
+
+    restored = Schedule.from_bytes(original.to_bytes())
+
+    assert restored == original
+    assert restored.slots_per_day == 6
+    assert restored["segunda"][2] == MATERIA_VAZIA
+
+
+def test_bytes_round_trip_into_another_table():
+    original = Schedule.from_dict(HORARIO)
+    table = SubjectTable()
+    table.intern("Geografia")
+
+    restored = Schedule.from_bytes(original.to_bytes(), subjects=table)
+
+    assert restored.subjects is table
+    assert restored.to_dict() == original.to_dict()
+    assert restored.class_id is None
+
+
+def test_invalid_bytes_are_rejected():
+    data = Schedule.from_dict(HORARIO).to_bytes()
+
+    with pytest.raises(ValueError):
+        Schedule.from_bytes(b"XXXX" + data[4:])
+
+
+def test_full_subject_table_rolls_over(monkeypatch):
+    monkeypatch.setattr(schedule_module, "_default_subjects", SubjectTable(max_size=3))
+    full = default_subjects()
+    first = Schedule.from_dict({"segunda": ["Matemática", "Português", "História"]}, class_id="6A")
+
+    second = Schedule.from_dict({"terça": ["Matemática", "Arte"]}, class_id="6B")
+
+    assert first.subjects is full
+    assert second.subjects is default_subjects() is not full
+    assert len(default_subjects()) == 2
+    assert first["segunda"][:3] == ["Matemática", "Português", "História"]
+    assert second["terça"][:2] == ["Matemática", "Arte"]
+
+
+def test_subject_table_without_rollover_raises():
+    table = SubjectTable(max_size=1)
+    table.intern("Arte")
+
+    with pytest.raises(OverflowError):
+        table.intern("Física")
@@ -0,0 +1,32 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+HORARIO = {"segunda": ["Matemática", "Matemática", "Português"], "terça": ["Arte"]}
+END_DATE = (date.today() + timedelta(days=120)).isoformat()
+
+
+def test_service_ics_etag_and_validation(workdir):
+    pytest.importorskip("aiohttp")
+    from aiohttp.test_utils import TestClient, TestServer
+    from service import create_app
+
+    body = {"schedule": HORARIO, "class_id": '6"A', "end_date": END_DATE}
+
+    async def scenario():
+        async with TestClient(TestServer(create_app(ocr_workers=1))) as client:
+            first = await client.post("/ics", json=body)
+            text = await first.text()
+            etag = first.headers["ETag"]
+            weak = await client.post("/ics", json=body, headers={"If-None-Match": f"W/{etag}"})
+            bad_date = await client.post("/ics", json={**body, "end_date": 123})
+            return first, text, weak, bad_date
+
+    first, text, weak, bad_date = asyncio.run(scenario())
+
+    assert first.status == 200
+    assert "BEGIN:VCALENDAR" in text
+    assert first.headers["Content-Disposition"] == 'attachment; filename="calendario_6_A.ics"'
+    assert weak.status == 304
+    assert bad_date.status == 400
@@ -0,0 +1,68 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from main import CalendarGenerator
+from schedule import Schedule
+from sinks import ExportPipeline, JsonSink, Sink
+
+HORARIO = {"segunda": ["Matemática", "Português"], "quarta": ["Arte"]}
+END_DATE = (date.today() + timedelta(days=120)).isoformat()
+
+
+class FailingSink(Sink):
+    name = "falha"
+
+    def write(self, schedule, compiled, end_date):
+        if schedule.class_id == "6B":
+            raise RuntimeError("saída fora do ar")
+        return f"ok {schedule.class_id}"
+
+
+def test_failing_sink_does_not_affect_the_others(workdir):
+    generator = CalendarGenerator()
+    pipeline = ExportPipeline([FailingSink(), JsonSink("output")])
+    for class_id in ["6A", "6B", "6C"]:
+        schedule = Schedule.from_dict(HORARIO, class_id=class_id)
+        pipeline.submit(schedule, generator.compile_events(schedule, END_DATE), END_DATE)
+    report = pipeline.close()
+
+    failing, json_stats = report.stats["falha"], report.stats["json"]
+    assert (failing.items, failing.errors, failing.last_error) == (2, 1, "saída fora do ar")
+    assert (json_stats.items, json_stats.errors) == (3, 0)
+    assert sorted(p.name for p in (workdir / "output").iterdir()) == ["horario_6A.json", "horario_6B.json", "horario_6C.json"]
+    assert not report.ok
+
+
+def test_process_table_uses_configured_sinks(workdir):
+    (workdir / "horarios.csv").write_text("turma,dia,1,2\n6A,segunda,Arte,Física\n7B,terça,Química,Arte\n",
+                                          encoding="utf-8")
+    generator = CalendarGenerator(sinks=["json", "csv"])
+
+    results = dict(generator.process_table("horarios.csv", END_DATE))
+
+    assert sorted(results) == ["6A", "7B"]
+    assert json.loads((workdir / "output" / "horario_7B.json").read_text(encoding="utf-8"))["turma"] == "7B"
+    assert generator.last_report.stats["csv"].items == 2
+
+
+def test_process_table_reports_failed_classes_after_the_others(workdir, monkeypatch):
+    (workdir / "horarios.csv").write_text("turma,dia,1\n6A,segunda,Arte\n6B,segunda,Arte\n6C,segunda,Arte\n",
+                                          encoding="utf-8")
+    generator = CalendarGenerator(sinks=["json"])
+    write = JsonSink.write
+
+    def flaky_write(self, schedule, compiled, end_date):
+        if schedule.class_id == "6B":
+            raise OSError("disco cheio")
+        return write(self, schedule, compiled, end_date)
+
+    monkeypatch.setattr(JsonSink, "write", flaky_write)
+    done = []
+    with pytest.raises(RuntimeError, match="6B"):
+        for class_id, _ in generator.process_table("horarios.csv", END_DATE):
+            done.append(class_id)
+
+    assert sorted(done) == ["6A", "6C"]
+    assert not list((workdir / "output").glob("*.tmp"))